@@ -0,0 +1,219 @@
+"""
+In-process cache of serialized recipe payloads.
+
+Recipes change rarely (bulk loads and the occasional user edit), but every
+page of recipe cards needs their payloads. Each worker keeps the payloads it
+has served in memory, keyed by recipe id. Writers bump a catalog version that
+lives in a small file next to the data, and every worker drops its cache as
+soon as it sees a newer version, so no worker keeps serving a stale recipe.
+Bumps also log the ids of the recipes they changed, so the in-process
+indexes can catch up on just those recipes instead of rebuilding.
+
+Payloads are cached without any per-user flags, callers annotate the copies
+they get back. The cache is per worker on purpose: a payload is re-derived
+from the recipe id, so a worker that hasn't served a recipe yet just loads
+it from the database once.
+"""
+
+import fcntl
+import os
+from collections import OrderedDict
+
+from config import Config
+from app.models import Recipe
+from app.membership import MEMBERSHIP_FLAGS
+
+
+class CatalogVersion:
+    """
+    Monotonic catalog version shared by all workers through a file.
+
+    Reading is a stat() call unless the file changed. Bumps take an exclusive
+    lock and atomically replace the file.
+
+    Every bump is also appended to a change log next to the file, as the new
+    version followed by the changed recipe ids, or "*" when the bump didn't
+    say which recipes changed (bulk loads).
+
+    Parameters:
+    - path (str): The version file.
+    - max_changes (int): Bumps kept in the change log.
+    """
+
+    def __init__(self, path, max_changes=1000):
+        self.path = path
+        self.changes_path = path + ".changes"
+        self.max_changes = max_changes
+        self._stat = None
+        self._version = 0
+
+    def get(self) -> int:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._stat = None
+            self._version = 0
+            return 0
+
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature != self._stat:
+            with open(self.path) as f:
+                self._version = int(f.read().strip() or 0)
+            self._stat = signature
+        return self._version
+
+    def bump(self, recipe_ids=None) -> int:
+        """
+        Move to the next version.
+
+        Parameters:
+        - recipe_ids (iterable of int): The recipes that changed, None if unknown.
+
+        Returns:
+        - int: The new version.
+        """
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._stat = None
+            version = self.get() + 1
+            # logged before the version moves, so whoever sees it finds its changes
+            self._log_change(version, recipe_ids)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(str(version))
+            os.replace(tmp_path, self.path)
+        return version
+
+    def _log_change(self, version, recipe_ids):
+        ids = "*" if recipe_ids is None else " ".join(str(int(i)) for i in recipe_ids)
+        with open(self.changes_path, "a") as f:
+            f.write(f"{version} {ids}\n")
+            size = f.tell()
+        # rough line count, trimmed to max_changes once it doubles
+        if size < 32 * self.max_changes:
+            return
+        with open(self.changes_path) as f:
+            lines = f.readlines()
+        if len(lines) > 2 * self.max_changes:
+            tmp_path = f"{self.changes_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(lines[-self.max_changes :])
+            os.replace(tmp_path, self.changes_path)
+
+    def changes_since(self, version) -> tuple[int, set]:
+        """
+        The recipes changed after version.
+
+        Returns:
+        - (int, set of int): The current version and the ids of the recipes
+          changed since version, or None instead of the ids if they aren't
+          known (a bulk change, or version is older than the change log).
+        """
+        current = self.get()
+        if version is None:
+            return current, None
+        if version == current:
+            return current, set()
+        changed = set()
+        try:
+            with open(self.changes_path) as f:
+                for line in f:
+                    logged, *ids = line.split()
+                    logged = int(logged)
+                    if logged <= version:
+                        continue
+                    if logged != version + 1 or ids == ["*"]:
+                        return current, None
+                    changed.update(map(int, ids))
+                    version = logged
+                    if version == current:
+                        return current, changed
+        except (FileNotFoundError, ValueError):
+            pass
+        return current, None
+
+
+class CatalogCache:
+    """
+    Read-through cache of recipe payloads, invalidated by the catalog version.
+
+    Parameters:
+    - version (CatalogVersion): The shared version to watch.
+    - max_entries (int): Least recently used payloads beyond this are dropped.
+    """
+
+    def __init__(self, version: CatalogVersion, max_entries=10_000):
+        self.version = version
+        self.max_entries = max_entries
+        self._seen_version = None
+        self._payloads = OrderedDict()
+
+    def current_version(self) -> int:
+        """the catalog version, clearing the cache if it moved on"""
+        version = self.version.get()
+        if version != self._seen_version:
+            self._payloads.clear()
+            self._seen_version = version
+        return version
+
+    def get_many(self, recipe_ids) -> list[dict]:
+        self.current_version()
+
+        missing = [
+            recipe_id for recipe_id in set(recipe_ids) if recipe_id not in self._payloads
+        ]
+        if missing:
+            for recipe in Recipe.query.filter(Recipe.id.in_(missing)):
+                self._payloads[recipe.id] = recipe_payload(recipe)
+
+        output = []
+        for recipe_id in recipe_ids:
+            payload = self._payloads.get(recipe_id)
+            if payload is not None:
+                self._payloads.move_to_end(recipe_id)
+                output.append(dict(payload))
+
+        while len(self._payloads) > self.max_entries:
+            self._payloads.popitem(last=False)
+        return output
+
+
+def visible_to(user_id):
+    """filter for the recipes user_id may see: public ones and their own, public only for None"""
+    if user_id is None:
+        return Recipe.is_public == True
+    return (Recipe.is_public == True) | (Recipe.author == str(user_id))
+
+
+def recipe_payload(recipe: Recipe) -> dict:
+    payload = recipe.to_dict()
+    for flag in MEMBERSHIP_FLAGS:
+        payload.pop(flag, None)
+    return payload
+
+
+catalog_version = CatalogVersion(Config.CATALOG_VERSION_PATH)
+catalog_cache = CatalogCache(catalog_version)
+
+
+def get_recipe_dicts(recipe_ids) -> list[dict]:
+    """
+    Recipe dicts for the given ids, in the same order.
+
+    Parameters:
+    - recipe_ids (iterable of int): The recipes to load. Unknown ids are skipped.
+
+    Returns:
+    - list: Fresh copies of the cached payloads, safe to modify.
+    """
+    return catalog_cache.get_many(list(recipe_ids))
+
+
+def bump_catalog_version(recipe_ids=None) -> int:
+    """
+    Call after recipes were created, updated or deleted.
+
+    Parameters:
+    - recipe_ids (iterable of int): The recipes that changed, None if unknown.
+    """
+    return catalog_version.bump(recipe_ids)
@@ -0,0 +1,134 @@
+"""
+Grocery-aisle categories for ingredient lines.
+
+data/ingredient2category.json maps ingredient lines we have seen before to a
+store category ("Produce", "Seasonings", ...). It is loaded once per worker
+and reloaded only when the file changes on disk.
+
+Lines are matched exactly first. Lines that are not in the file go through a
+normalized key (lowercase, no quantities, units or punctuation, plurals
+folded) so that "2 cups chopped onions" finds the category of "1 chopped
+onion". This also matches the lines stored on Recipe.ingredients, which had
+their commas and slashes stripped on the way into the database.
+"""
+
+import json
+import os
+import re
+from collections import Counter
+
+from config import Config
+
+OTHER = "Other"
+
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+_NON_WORD = re.compile(r"[^a-z\s]")
+
+# words that carry amounts rather than identify the ingredient
+QUANTITY_WORDS = {
+    "a", "an", "and", "or", "of", "to", "about", "plus", "more",
+    "cup", "cups", "tablespoon", "tablespoons", "tbsp", "teaspoon", "teaspoons",
+    "tsp", "ounce", "ounces", "oz", "pound", "pounds", "lb", "lbs", "gram",
+    "grams", "g", "kg", "ml", "liter", "liters", "quart", "quarts", "pint",
+    "pints", "gallon", "gallons", "pinch", "pinches", "dash", "clove", "cloves",
+    "can", "cans", "package", "packages", "stick", "sticks", "bunch", "bunches",
+    "large", "medium", "small", "whole", "half", "one", "two", "three", "four",
+    "five", "six", "seven", "eight", "nine", "ten", "dozen",
+}
+
+
+def fold_plural(word: str) -> str:
+    if len(word) <= 3 or word.endswith("ss"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes", "sses")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(line: str) -> str:
+    """
+    A loose matching key for an ingredient line.
+
+    >>> normalize_ingredient("2 1/2 Cups Chopped Onions (about 2 large)")
+    'chopped onion'
+    """
+    line = line.lower()
+    line = _PARENTHETICAL.sub(" ", line)
+    line = _NON_WORD.sub(" ", line)
+    words = [fold_plural(word) for word in line.split() if word not in QUANTITY_WORDS]
+    return " ".join(words)
+
+
+class IngredientCategorizer:
+    """
+    Category lookups backed by a JSON file of line -> category.
+
+    Parameters:
+    - path (str): Path to the JSON mapping.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._exact = {}
+        self._normalized = {}
+        self.hits = Counter()
+
+    def _load_if_changed(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+
+        with open(self.path, "r") as f:
+            exact = json.load(f)
+
+        # several lines can share a key, keep the category most of them agree on
+        votes = {}
+        for line, category in exact.items():
+            key = normalize_ingredient(line)
+            if key:
+                votes.setdefault(key, Counter())[category] += 1
+
+        self._exact = exact
+        self._normalized = {
+            key: counter.most_common(1)[0][0] for key, counter in votes.items()
+        }
+        self._mtime = mtime
+
+    def categorize(self, ingredients: list[str]) -> list[str]:
+        """
+        Category of every ingredient line, OTHER for the ones we can't place.
+
+        Parameters:
+        - ingredients (list of str): Raw ingredient lines.
+
+        Returns:
+        - list of str: One category per line, in the same order.
+        """
+        self._load_if_changed()
+
+        categories = []
+        for ingredient in ingredients:
+            category = self._exact.get(ingredient)
+            if category is not None:
+                self.hits["exact"] += 1
+            else:
+                category = self._normalized.get(normalize_ingredient(ingredient))
+                if category is not None:
+                    self.hits["normalized"] += 1
+                else:
+                    category = OTHER
+                    self.hits["miss"] += 1
+            categories.append(category)
+        return categories
+
+    def stats(self) -> dict:
+        """exact/normalized/miss counters since the worker started"""
+        return dict(self.hits)
+
+
+ingredient_categorizer = IngredientCategorizer(Config.INGREDIENT_CATEGORY_PATH)
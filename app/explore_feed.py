@@ -0,0 +1,146 @@
+"""
+Seeded, shuffled ordering for the explore feed.
+
+Each explore session gets a random seed. The feed is a fixed permutation of
+the recipe id array, position p -> (stride * p + offset) mod n, with stride
+coprime to n and both drawn from the seed. It gives the same shuffle on every
+page and on every gunicorn worker without asking the database to ORDER BY
+random(), and a page is per_page array lookups: nothing is sorted per seed.
+
+The permutation depends on n, so a session keeps the size of the public
+catalog it started with and only the first n public ids (the oldest, as they
+are ordered by id) are shuffled for it. Recipes made public since then wait
+for the next session instead of reshuffling the one being paged through.
+"""
+
+import random
+from bisect import bisect_left
+from math import gcd
+
+import sqlalchemy as sa
+
+from app import db
+from app.models import Recipe
+from app.catalog import get_recipe_dicts, catalog_version
+
+
+def new_seed() -> int:
+    return random.getrandbits(32)
+
+
+def permutation(seed: int, n: int) -> tuple[int, int]:
+    """
+    (stride, offset) of the seed's permutation of n positions.
+
+    random.Random(seed) is deterministic across processes, unlike hash().
+    Strides close to 0 or n would keep neighbouring ids together, so they are
+    drawn again.
+    """
+    if n < 2:
+        return 1, 0
+    rng = random.Random(seed)
+    while True:
+        stride = rng.randrange(1, n)
+        if gcd(stride, n) == 1 and (n < 8 or n // 8 <= stride <= n - n // 8):
+            return stride, rng.randrange(n)
+
+
+class ExploreFeed:
+    """
+    Shuffled pages of the public catalog, optionally merged with a user's
+    private recipes.
+
+    The public id list is reloaded whenever the catalog version changes.
+    """
+
+    def __init__(self):
+        self._public_ids = None
+        self._version = None
+
+    def public_ids(self) -> tuple:
+        version = catalog_version.get()
+        if self._public_ids is None or version != self._version:
+            ids = db.session.scalars(
+                sa.select(Recipe.id).where(Recipe.is_public == True).order_by(Recipe.id)
+            ).all()
+            self._public_ids = tuple(ids)
+            self._version = version
+        return self._public_ids
+
+    def is_public(self, recipe_id) -> bool:
+        public_ids = self.public_ids()
+        i = bisect_left(public_ids, recipe_id)
+        return i < len(public_ids) and public_ids[i] == recipe_id
+
+    def page_ids(
+        self, seed, page, per_page, extra_ids=(), n_public=None, n_extra=None
+    ) -> list[int]:
+        """
+        Ids of one page of the shuffled feed.
+
+        Parameters:
+        - seed (int): The session's shuffle seed.
+        - page (int): 1-indexed page number.
+        - per_page (int): Page size.
+        - extra_ids (iterable of int): Non-public recipes to shuffle in (the
+          user's own). Those made public since are skipped, as they are
+          already in the public catalog.
+        - n_public (int): The public catalog size when the session started,
+          the current size by default.
+        - n_extra (int): The number of extras when the session started,
+          len(extra_ids) by default. Positions past the extras left are skipped.
+
+        Returns:
+        - list: Recipe ids, at most per_page of them.
+        """
+        public_ids = self.public_ids()
+        n_public = len(public_ids) if n_public is None else min(n_public, len(public_ids))
+        # the extras extend the id array, so they are shuffled in with the rest
+        extras = sorted(set(extra_ids))
+        n = n_public + (len(extras) if n_extra is None else n_extra)
+        stride, offset = permutation(seed, n)
+
+        start = max(per_page * (page - 1), 0)
+        stop = min(per_page * page, n)
+
+        output = []
+        for position in range(start, stop):
+            index = (stride * position + offset) % n
+            if index < n_public:
+                output.append(public_ids[index])
+            elif index - n_public < len(extras) and not self.is_public(extras[index - n_public]):
+                output.append(extras[index - n_public])
+        return output
+
+
+explore_feed = ExploreFeed()
+
+
+def private_recipe_ids(user_id, limit=None) -> list[int]:
+    """
+    ids of the user's own recipes that are not in the public catalog, oldest first.
+
+    Parameters:
+    - limit (int): At most this many, None for all of them.
+    """
+    return db.session.scalars(
+        sa.select(Recipe.id)
+        .where(
+            Recipe.author == str(user_id),
+            sa.func.coalesce(Recipe.is_public, False) == False,
+        )
+        .order_by(Recipe.id)
+        .limit(limit)
+    ).all()
+
+
+def public_count() -> int:
+    """the size of the public catalog, kept with a session's seed"""
+    return len(explore_feed.public_ids())
+
+
+def load_page(seed, page, per_page, extra_ids=(), n_public=None, n_extra=None) -> list[dict]:
+    """Recipe dicts of one page of the feed, in feed order"""
+    return get_recipe_dicts(
+        explore_feed.page_ids(seed, page, per_page, extra_ids, n_public, n_extra)
+    )
@@ -0,0 +1,332 @@
+"""
+Rule-based ingredient line parsing and quantity consolidation.
+
+Splits lines such as "1 1/2 cups all-purpose flour, sifted" into
+(quantity, unit, element) with a handful of regular expressions, then sums
+lines of the same element whose units sugarcube can convert between. No
+spaCy model or OpenAI call is involved, and each distinct line is parsed only
+once per worker.
+"""
+
+import re
+from fractions import Fraction
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from src import sugarcube as sc
+from app.categorizer import fold_plural
+
+UNICODE_FRACTIONS = {
+    "¼": "1/4", "½": "1/2", "¾": "3/4", "⅓": "1/3", "⅔": "2/3",
+    "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "dozen": 12,
+}
+
+# Recipe.ingredients had its slashes stripped on the way into the database,
+# so "1 1/2 cups" is stored as "1 12 cups". These are the fractions that can
+# come out of that.
+STRIPPED_FRACTIONS = {
+    "12": 1 / 2, "13": 1 / 3, "23": 2 / 3, "14": 1 / 4, "34": 3 / 4,
+    "18": 1 / 8, "38": 3 / 8, "58": 5 / 8, "78": 7 / 8,
+}
+
+UNIT_ABBREVIATIONS = {
+    "t": "teaspoon", "tsp": "teaspoon", "tsps": "teaspoon",
+    "tbsp": "tablespoon", "tbsps": "tablespoon", "tbs": "tablespoon", "tbl": "tablespoon",
+    "c": "cup", "oz": "ounce", "lb": "pound", "lbs": "pound",
+    "g": "gram", "gr": "gram", "kg": "kilogram", "mg": "milligram",
+    "ml": "milliliter", "l": "liter", "dl": "deciliter", "cl": "centiliter",
+    "pt": "pint", "qt": "quart", "gal": "gallon",
+    "fl oz": "fluidOunce", "fluid oz": "fluidOunce",
+}
+
+# units whose converter is a placeholder rather than a real conversion
+UNCONVERTIBLE_UNITS = {"bunch", "stick", "head", "clove"}
+
+CONTAINER_WORDS = {"can", "cans", "jar", "jars", "package", "packages", "box", "boxes", "bag", "bags"}
+
+_NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?"
+_QUANTITY = re.compile(
+    rf"^(?P<low>{_NUMBER})(?:\s*(?:-|–|to)\s*(?P<high>{_NUMBER}))?\s*"
+)
+_PARENTHETICAL = re.compile(r"\(([^)]*)\)")
+# container sizes: "(15-ounce)" or "15-ounce"
+_SIZE = re.compile(r"^(?:\(([^)]*)\)|(\d[\d./ ]*-[a-z]+\.?))\s*")
+# metric equivalents: "2 cups/256 grams flour"
+_ALTERNATE_AMOUNT = re.compile(r"^/\s*[\d./]+\s*[a-z]+\.?\s*")
+_WORD = re.compile(r"[a-z]+\.?(?:\s+[a-z]+\.?)?")
+
+
+def _unit_table() -> dict:
+    table = {}
+    for measure in (sc.Volume, sc.Mass):
+        for name, unit in measure.units.items():
+            table[name.lower()] = unit
+            table[unit.name.lower() + "s"] = unit
+            table[unit.name.lower() + "es"] = unit
+    for alias, name in UNIT_ABBREVIATIONS.items():
+        table[alias] = sc.available_measures[name]
+    table["fluid ounce"] = table["fluid ounces"] = sc.Volume.fluidOunce
+    return table
+
+
+UNITS = _unit_table()
+
+
+class ParsedIngredient(NamedTuple):
+    quantity: Optional[float]
+    unit: Optional[sc.Unit]
+    element: str  # normalized key, used to decide what can be summed
+    name: str  # the element as written, for display
+    text: str  # the original line
+
+
+def _to_number(text: str) -> float:
+    return float(sum(Fraction(part) for part in text.split()))
+
+
+def _normalize_numbers(line: str) -> str:
+    for char, fraction in UNICODE_FRACTIONS.items():
+        line = line.replace(char, f" {fraction}")
+    return line.strip()
+
+
+def _match_unit(text: str):
+    """(unit, length of the matched text) for a unit at the start of text"""
+    match = _WORD.match(text)
+    if not match:
+        return None, 0
+    words = match.group(0)
+    # prefer two-word units ("fluid ounce") over their first word
+    candidates = [words]
+    if " " in words:
+        candidates.append(words.split()[0])
+    for candidate in candidates:
+        unit = UNITS.get(candidate.rstrip("."))
+        if unit is not None:
+            return unit, len(candidate)
+    return None, 0
+
+
+def _parse_quantity(rest: str, stripped=True):
+    """
+    (quantity, remaining text), handling ranges, number words and stripped fractions.
+
+    With stripped, a lone "14" right before a unit may be a stripped 1/4:
+    it is read as the fraction before a singular unit name ("14 teaspoon"),
+    and as no quantity at all (so the line is never summed) before a plural
+    or abbreviated one ("12 oz"), where it could be either.
+    """
+    match = _QUANTITY.match(rest)
+    if match:
+        quantity = _to_number(match.group("high") or match.group("low"))
+        if stripped and match.group("high") is None and match.group("low") in STRIPPED_FRACTIONS:
+            after = rest[match.end():]
+            unit, length = _match_unit(after)
+            if unit is not None:
+                if after[:length].rstrip(".") == unit.name.lower():
+                    return STRIPPED_FRACTIONS[match.group("low")], after
+                return None, rest
+        rest = rest[match.end():]
+        # "1 12 cups" -> 1 1/2 cups when a unit follows
+        pieces = rest.split(maxsplit=1)
+        if (
+            len(pieces) == 2
+            and pieces[0] in STRIPPED_FRACTIONS
+            and quantity % 1 == 0
+            and _match_unit(pieces[1])[0] is not None
+        ):
+            quantity += STRIPPED_FRACTIONS[pieces[0]]
+            rest = pieces[1]
+        return quantity, rest
+
+    first, _, tail = rest.partition(" ")
+    if first in NUMBER_WORDS and tail:
+        return float(NUMBER_WORDS[first]), tail
+    return None, rest
+
+
+def element_key(name: str) -> str:
+    return " ".join(fold_plural(word) for word in re.findall(r"[a-z]+", name.lower()))
+
+
+@lru_cache(maxsize=65_536)
+def parse_ingredient(line: str) -> ParsedIngredient:
+    """
+    Split an ingredient line into quantity, unit and element.
+
+    Lines without a recognizable quantity come back with quantity and unit None.
+
+    >>> parse_ingredient("1 1/2 cups all-purpose flour, sifted")[:3]
+    (1.5, cup, 'all purpose flour')
+    >>> parse_ingredient("2 (15-ounce) cans chickpeas")[:3]
+    (30.0, ounce, 'chickpea')
+    >>> parse_ingredient("14 teaspoon salt")[:3]
+    (0.25, teaspoon, 'salt')
+    """
+    rest = _normalize_numbers(line).lower()
+    quantity, rest = _parse_quantity(rest)
+    unit = None
+
+    if quantity is not None:
+        # "2 (15-ounce) cans": the container size carries the unit
+        size = _SIZE.match(rest)
+        if size:
+            inner = (size.group(1) or size.group(2)).replace("-", " ")
+            # container sizes are written "14-ounce", never as a stripped fraction
+            inner_quantity, inner_rest = _parse_quantity(inner, stripped=False)
+            inner_unit, _ = _match_unit(inner_rest)
+            if inner_quantity is not None and inner_unit is not None:
+                quantity *= inner_quantity
+                unit = inner_unit
+                rest = rest[size.end():]
+                first, _, tail = rest.partition(" ")
+                if first in CONTAINER_WORDS:
+                    rest = tail
+
+        if unit is None:
+            unit, length = _match_unit(rest)
+            rest = rest[length:].lstrip()
+            rest = _ALTERNATE_AMOUNT.sub("", rest)
+
+        # "1 tablespoon plus 1/2 teaspoon"
+        if unit is not None and rest.startswith("plus "):
+            extra_quantity, extra_rest = _parse_quantity(rest[5:])
+            extra_unit, length = _match_unit(extra_rest)
+            if extra_quantity is not None and _compatible(unit, extra_unit):
+                quantity += _convert(extra_quantity, extra_unit, unit)
+                rest = extra_rest[length:].lstrip()
+
+    if rest.startswith("of "):
+        rest = rest[3:]
+    name = _PARENTHETICAL.sub("", rest.split(",")[0]).strip()
+    name = " ".join(name.replace("-", " ").split())
+
+    return ParsedIngredient(quantity, unit, element_key(name), name, line)
+
+
+def _compatible(a: sc.Unit, b: sc.Unit) -> bool:
+    if a is b:
+        return True
+    if a is None or b is None:
+        return False
+    if a.name in UNCONVERTIBLE_UNITS or b.name in UNCONVERTIBLE_UNITS:
+        return False
+    return a.measure is b.measure
+
+
+def _convert(quantity, unit, to_unit):
+    if unit is to_unit:
+        return quantity
+    return sc.conversions.convert(quantity, unit, to_unit)
+
+
+def format_quantity(value: float) -> str:
+    """Mixed fraction to the nearest eighth: 1.375 -> '1 3/8'"""
+    eighths = round(value * 8)
+    if eighths == 0:
+        return "%g" % round(value, 3)
+    whole, remainder = divmod(eighths, 8)
+    if remainder == 0:
+        return str(whole)
+    fraction = Fraction(remainder, 8)
+    if whole == 0:
+        return f"{fraction.numerator}/{fraction.denominator}"
+    return f"{whole} {fraction.numerator}/{fraction.denominator}"
+
+
+def format_unit(unit: sc.Unit, value: float) -> str:
+    name = "fluid ounce" if unit is sc.Volume.fluidOunce else unit.name
+    if value > 1:
+        name += "es" if name.endswith(("ch", "sh")) else "s"
+    return name
+
+
+def _is_plural(name: str) -> bool:
+    last = name.rsplit(" ", 1)[-1]
+    return fold_plural(last) != last
+
+
+def pluralize(name: str) -> str:
+    """
+    name with its last word in the plural, for unitless sums.
+
+    >>> pluralize("onion"), pluralize("red cherry"), pluralize("potato"), pluralize("peach")
+    ('onions', 'red cherries', 'potatoes', 'peaches')
+    """
+    head, _, last = name.rpartition(" ")
+    if _is_plural(last):
+        return name
+    if last.endswith(("s", "x", "z", "ch", "sh")) or last in ("tomato", "potato"):
+        last += "es"
+    elif last.endswith("y") and last[-2:-1] not in ("", "a", "e", "i", "o", "u"):
+        last = last[:-1] + "ies"
+    else:
+        last += "s"
+    return f"{head} {last}" if head else last
+
+
+class ConsolidatedIngredient(NamedTuple):
+    quantity: Optional[float]
+    unit: Optional[sc.Unit]
+    name: str
+    lines: tuple  # the original lines that were summed into this one
+
+    def display(self) -> str:
+        if len(self.lines) == 1 or self.quantity is None:
+            return self.lines[0]
+        parts = [format_quantity(self.quantity)]
+        if self.unit is not None:
+            parts.append(format_unit(self.unit, self.quantity))
+            parts.append(self.name)
+        else:
+            # "1 egg" + "3 eggs" counts eggs, whichever line came first
+            parts.append(pluralize(self.name) if self.quantity > 1 else self.name)
+        return " ".join(parts)
+
+
+def consolidate_ingredients(lines: list[str]) -> list[ConsolidatedIngredient]:
+    """
+    Sum the quantities of lines that describe the same element in compatible units.
+
+    Amounts are converted to the unit of the first line of each group. Lines
+    without a quantity, and lines whose units can't be converted into each
+    other, are kept as their own entries.
+
+    >>> [c.display() for c in consolidate_ingredients(
+    ...     ["1 cup flour", "2 tablespoons flour, sifted", "2 eggs", "3 eggs"])]
+    ['1 1/8 cups flour', '5 eggs']
+    >>> [c.display() for c in consolidate_ingredients(
+    ...     ["1 egg", "3 eggs", "1 onion", "2 onions, diced", "1 lemon", "1 lemon"])]
+    ['4 eggs', '3 onions', '2 lemons']
+    """
+    groups = []  # [quantity, unit, name, [lines]]
+    by_element = {}  # element key -> indexes into groups
+    for line in lines:
+        parsed = parse_ingredient(line)
+        if parsed.quantity is None or not parsed.element:
+            groups.append([None, None, parsed.name, [line]])
+            continue
+
+        for index in by_element.get(parsed.element, ()):
+            group = groups[index]
+            if _compatible(group[1], parsed.unit):
+                group[0] += _convert(parsed.quantity, parsed.unit, group[1])
+                group[3].append(line)
+                # a plural line as written beats a guessed plural in display()
+                if group[1] is None and _is_plural(parsed.name) and not _is_plural(group[2]):
+                    group[2] = parsed.name
+                break
+        else:
+            by_element.setdefault(parsed.element, []).append(len(groups))
+            groups.append([parsed.quantity, parsed.unit, parsed.name, [line]])
+
+    return [
+        ConsolidatedIngredient(quantity, unit, name, tuple(group_lines))
+        for quantity, unit, name, group_lines in groups
+    ]
@@ -0,0 +1,86 @@
+"""
+Per-user membership flags for recipe cards.
+
+Every card we render needs to know whether the recipe is in the user's recipe
+list, favorites and cookbook. Rather than asking the database once per card
+and per flag, we load all three memberships for a whole page of recipe ids in
+a single UNION ALL query.
+"""
+
+import sqlalchemy as sa
+
+from app import db
+from app.models import RecipeList, Favorite, CookBook
+
+# flag name -> association model holding (user_id, recipe_id) rows
+MEMBERSHIP_FLAGS = {
+    "in_recipe_list": RecipeList,
+    "in_favorites": Favorite,
+    "in_cookbook": CookBook,
+}
+
+
+def _recipe_id(recipe):
+    return recipe["id"] if isinstance(recipe, dict) else recipe.id
+
+
+def load_membership(user_id, recipe_ids) -> dict[int, set[str]]:
+    """
+    Load the membership flags of a user for a collection of recipes in one query.
+
+    Parameters:
+    - user_id (int): The user whose recipe list, favorites and cookbook are checked.
+    - recipe_ids (iterable of int): The recipes to check.
+
+    Returns:
+    - dict: recipe id -> set of flag names (see MEMBERSHIP_FLAGS) that are true.
+      Recipes without any membership are absent.
+    """
+    recipe_ids = list({int(recipe_id) for recipe_id in recipe_ids})
+    if not recipe_ids:
+        return {}
+
+    selects = [
+        sa.select(model.recipe_id, sa.literal(flag).label("flag")).where(
+            model.user_id == user_id, model.recipe_id.in_(recipe_ids)
+        )
+        for flag, model in MEMBERSHIP_FLAGS.items()
+    ]
+
+    membership = {}
+    for recipe_id, flag in db.session.execute(sa.union_all(*selects)):
+        membership.setdefault(recipe_id, set()).add(flag)
+    return membership
+
+
+def annotate_recipes(recipes, user_id, as_json=False) -> list:
+    """
+    Set in_recipe_list, in_favorites and in_cookbook on every recipe.
+
+    Works on recipe dicts (flags are set as keys) and Recipe objects (flags are
+    set as attributes, which Recipe.to_dict picks up).
+
+    Parameters:
+    - recipes (list): Recipe dicts or Recipe objects.
+    - user_id (int): The user to annotate for.
+    - as_json (bool): If True, Recipe objects are returned as dicts.
+
+    Returns:
+    - list: The annotated recipes, in the same order.
+    """
+    recipes = list(recipes)
+    membership = load_membership(user_id, [_recipe_id(r) for r in recipes])
+
+    output = []
+    for recipe in recipes:
+        flags = membership.get(_recipe_id(recipe), ())
+        if isinstance(recipe, dict):
+            for flag in MEMBERSHIP_FLAGS:
+                recipe[flag] = flag in flags
+        else:
+            for flag in MEMBERSHIP_FLAGS:
+                setattr(recipe, flag, flag in flags)
+            if as_json:
+                recipe = recipe.to_dict()
+        output.append(recipe)
+    return output
@@ -21,7 +21,7 @@ class Recipe(db.Model):
     __tablename__ = "recipes"
     id = sa.Column(sa.Integer, primary_key=True)
     title = sa.Column(sa.String(255), index=True, unique=True)
-    author = sa.Column(sa.String(64))
+    author = sa.Column(sa.String(64), index=True)
     canonical_url = sa.Column(sa.String(256))
     category = sa.Column(sa.String(256))
     image_url = sa.Column(sa.String(255))
@@ -60,6 +60,8 @@ class Recipe(db.Model):
             d["in_cookbook"] = self.in_cookbook
         if "in_recipe_list" in self.__dict__:
             d["in_recipe_list"] = self.in_recipe_list
+        if "in_favorites" in self.__dict__:
+            d["in_favorites"] = self.in_favorites
 
         if as_str:
             d = str(d)
@@ -169,27 +171,73 @@ class User(UserMixin, db.Model):
 
     def tag_recipes(self, recipes: list[Recipe], as_json=False) -> list[Recipe]:
         """
-        Tags the recipes in the list with whether or not they are in the user's cookbook or recipe list.
+        Tags the recipes in the list with whether or not they are in the user's cookbook, recipe list or favorites.
         """
+        from app.membership import annotate_recipes
+
         output = []
-        if isinstance(recipes[0], dict):
-            cookbook_ids = [cb.recipe.id for cb in self.cookbook]
-            recipe_ids = [rl.recipe.id for rl in self.recipe_list]
-            for recipe in recipes:
-                recipe["in_cookbook"] = recipe["id"] in cookbook_ids
-                recipe["in_recipe_list"] = recipe["id"] in recipe_ids
+        for recipe in annotate_recipes(recipes, self.id):
+            if isinstance(recipe, dict):
                 if not as_json:
                     recipe = Recipe.from_dict(recipe)
-                output.append(recipe)
-        else:
-            for recipe in recipes:
-                recipe.in_cookbook = recipe in self.cookbook
-                recipe.in_recipe_list = recipe in self.recipe_list
-                if as_json:
-                    recipe = recipe.to_dict()
-                output.append(recipe)
+            elif as_json:
+                recipe = recipe.to_dict()
+            output.append(recipe)
         return output
 
+    def get_cookbook_cards(self, query=None, page=None, per_page=24, full=False) -> list[dict]:
+        """
+        The user's cookbook as recipe cards, filtered, sorted by title and paged in SQL.
+
+        Parameters:
+        - query (str): Only recipes whose title contains this, case-insensitively.
+        - page (int): 1-based page of per_page cards, or None for all of them.
+        - per_page (int): Cards per page.
+        - full (bool): Whole recipe payloads (Recipe.to_dict) instead of cards.
+
+        Returns:
+        - list of dict: id, title, image_url, total_time (or the full recipe) and
+          the membership flags.
+        """
+        in_recipe_list = sa.exists().where(
+            RecipeList.user_id == self.id, RecipeList.recipe_id == Recipe.id
+        )
+        in_favorites = sa.exists().where(
+            Favorite.user_id == self.id, Favorite.recipe_id == Recipe.id
+        )
+        columns = (
+            [Recipe]
+            if full
+            else [Recipe.id, Recipe.title, Recipe.image_url, Recipe.total_time]
+        )
+        statement = (
+            sa.select(
+                *columns,
+                in_recipe_list.label("in_recipe_list"),
+                in_favorites.label("in_favorites"),
+            )
+            .join(CookBook, CookBook.recipe_id == Recipe.id)
+            .where(CookBook.user_id == self.id)
+            .order_by(Recipe.title, Recipe.id)
+        )
+        if query:
+            statement = statement.where(Recipe.title.ilike(f"%{query}%"))
+        if page is not None:
+            statement = statement.limit(per_page).offset(per_page * (page - 1))
+
+        rows = db.session.execute(statement)
+        if full:
+            return [
+                dict(
+                    row.Recipe.to_dict(),
+                    in_cookbook=True,
+                    in_recipe_list=row.in_recipe_list,
+                    in_favorites=row.in_favorites,
+                )
+                for row in rows
+            ]
+        return [dict(row._mapping, in_cookbook=True) for row in rows]
+
     def get_cookbook(self, as_json=False):
 
         joined_query = (
@@ -284,6 +332,7 @@ class RecipeList(db.Model):
 
 class CookBook(db.Model):
     __tablename__ = "cookbooks"
+    __table_args__ = (sa.Index("ix_cookbooks_user_id_recipe_id", "user_id", "recipe_id"),)
     id = sa.Column(sa.Integer, primary_key=True)
     user_id = sa.Column(sa.Integer, sa.ForeignKey("users.id"))
     recipe_id = sa.Column(sa.Integer, sa.ForeignKey("recipes.id"))
@@ -2,12 +2,14 @@
 import logging
 from app import db, app
 from app.models import Recipe
-from config import Config
-import json
+from app.catalog import bump_catalog_version
 import random
 from openai import OpenAI
 import datetime
+import os
 import argparse
+import sqlalchemy as sa
+from src.recipe_catalog import DATA_DIR, append_recipe, iter_catalog, iter_chunks, write_catalog
 
 # Create a logger
 logger = logging.getLogger(__name__)
@@ -36,101 +38,172 @@ def char_to_price(n_chars):
 
 def backup_recipe_json():
     today = datetime.date.today()
-    with open(Config.ROOT_DIR + "/data/recipes.json") as file:
-        recipes_data = json.load(file)
-    with open(
-        Config.ROOT_DIR + "/data/recipes_backup_{}.json".format(today), "w"
-    ) as file:
-        json.dump(recipes_data, file)
+    write_catalog(
+        iter_catalog(), os.path.join(DATA_DIR, "recipes_backup_{}.jsonl".format(today))
+    )
 
     return True
 
 
-def add_recipes_to_db():
-    logger.info("Adding recipes to database")
-    with app.app_context():
+def clean_ingredient(s: str):
+    """removes any problematic characters from the string such as , ' " \ / etc."""
+    return (
+        s.replace(",", "")
+        .replace("'", "")
+        .replace('"', "")
+        .replace("\\", "")
+        .replace("/", "")
+    )
+
+
+# the columns add_recipes_to_db writes, besides title
+RECIPE_COLUMNS = (
+    "author",
+    "canonical_url",
+    "category",
+    "image_url",
+    "ingredients",
+    "description",
+    "instructions",
+    "total_time",
+    "yields",
+    "is_public",
+)
+
+
+def recipe_row(recipe_data: dict) -> dict:
+    """the recipes table row for a recipe from the catalog"""
+    ingredients = ",".join(
+        [clean_ingredient(ingredient) for ingredient in recipe_data.get("ingredients")]
+    )
+    return {
+        "title": recipe_data.get("title")[:255],
+        "author": recipe_data.get("author"),
+        "canonical_url": recipe_data.get("canonical_url"),
+        "category": recipe_data.get("category"),
+        "image_url": recipe_data.get("image"),
+        "ingredients": ingredients[:5_000],
+        "description": recipe_data.get("description"),
+        "instructions": recipe_data.get("instructions")[:10_000],
+        "total_time": recipe_data.get("total_time"),
+        "yields": recipe_data.get("yields"),
+        "is_public": recipe_data.get("is_public", True),
+    }
+
+
+def upsert_statement(dialect: str):
+    """
+    INSERT ... ON CONFLICT (title) DO UPDATE for dialects that have it.
+
+    Returns:
+    - The statement, to be executed with a list of rows, or None for other dialects.
+    """
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(Recipe)
+    return statement.on_conflict_do_update(
+        index_elements=[Recipe.title],
+        set_={column: statement.excluded[column] for column in RECIPE_COLUMNS},
+    )
+
+
+def write_rows(upsert, rows):
+    """
+    Insert or update rows of the recipes table.
 
-        with open(Config.ROOT_DIR + "/data/recipes.json") as file:
-            recipes_data = json.load(file)
-
-        def clean_ingredient(s: str):
-            """removes any problematic characters from the string such as , ' " \ / etc."""
-            return (
-                s.replace(",", "")
-                .replace("'", "")
-                .replace('"', "")
-                .replace("\\", "")
-                .replace("/", "")
+    Parameters:
+    - upsert: upsert_statement() for this dialect, or None.
+    - rows (list of dict): recipe_row()s, with the "id" of the recipe they update
+      (None if it was inserted earlier in this run), or no "id" for new recipes.
+    """
+    if upsert is not None:
+        db.session.execute(upsert, [{k: v for k, v in row.items() if k != "id"} for row in rows])
+        return
+
+    updates = [row for row in rows if row.get("id") is not None]
+    inserts = [row for row in rows if "id" not in row]
+    if updates:
+        db.session.execute(sa.update(Recipe), updates)
+    if inserts:
+        db.session.execute(sa.insert(Recipe), inserts)
+    # a title repeated later in the catalog than its first insert
+    for row in rows:
+        if "id" in row and row["id"] is None:
+            values = {k: v for k, v in row.items() if k not in ("id", "title")}
+            db.session.execute(
+                sa.update(Recipe).where(Recipe.title == row["title"]).values(**values)
             )
 
-        for recipe_data in recipes_data.values():
-            title = recipe_data.get("title")[:255]
-            existing_recipe = Recipe.query.filter_by(title=title).first()
-
-            if existing_recipe:
-
-                ingredients = ",".join(
-                    [
-                        clean_ingredient(ingredient)
-                        for ingredient in recipe_data.get("ingredients")
-                    ]
-                )
-
-                existing_recipe.author = recipe_data.get("author")
-                existing_recipe.canonical_url = recipe_data.get("canonical_url")
-                existing_recipe.category = recipe_data.get("category")
-                existing_recipe.image_url = recipe_data.get("image")
-                existing_recipe.ingredients = ingredients[:5_000]
-                existing_recipe.description = recipe_data.get("description")
-                existing_recipe.instructions = recipe_data.get("instructions")[:10_000]
-                existing_recipe.total_time = recipe_data.get("total_time")
-                existing_recipe.yields = recipe_data.get("yields")
-                existing_recipe.is_public = recipe_data.get("is_public", True)
-            else:
-
-                ingredients = ",".join(
-                    [
-                        clean_ingredient(ingredient)
-                        for ingredient in recipe_data.get("ingredients")
-                    ]
-                )
-
-                recipe = Recipe(
-                    title=title,
-                    author=recipe_data.get("author"),
-                    canonical_url=recipe_data.get("canonical_url"),
-                    category=recipe_data.get("category"),
-                    image_url=recipe_data.get("image"),
-                    ingredients=ingredients[:5_000],
-                    description=recipe_data.get("description"),
-                    instructions=recipe_data.get("instructions")[:10_000],
-                    total_time=recipe_data.get("total_time"),
-                    yields=recipe_data.get("yields"),
-                    is_public=True,
-                )
-                db.session.add(recipe)
 
-        db.session.commit()
+def add_recipes_to_db(chunk_size=1_000):
+    """
+    Load the recipe catalog into the recipes table.
 
+    Existing titles are read in one query, with a hash of their columns, and
+    the catalog is streamed in chunks and compared against them in memory, so
+    only new and changed recipes are written. Those go out as executemany
+    upserts, each chunk in its own transaction.
 
-def refine_recipe_descriptions():
-    logger.info("Refining recipe descriptions")
-    with open(Config.ROOT_DIR + "/data/recipes.json") as file:
-        recipes_data = json.load(file)
+    Parameters:
+    - chunk_size (int): Recipes per upsert and commit.
 
-    recipes_with_descriptions = [
-        recipe
-        for recipe in recipes_data.values()
-        if recipe.get("description") is not None
-    ]
-    logger.info(f"{len(recipes_with_descriptions)} recipes with descriptions.")
-    long_descriptions = [
-        recipe
-        for recipe in recipes_with_descriptions
-        if len(recipe.get("description")) > 300
-    ]
+    Returns:
+    - int: The number of recipes inserted or updated.
+    """
+    logger.info("Adding recipes to database")
+    with app.app_context():
+
+        def column_hash(row):
+            return hash(tuple(row[column] for column in RECIPE_COLUMNS))
+
+        # title -> (Recipe.id, hash of the columns)
+        existing = {
+            row.title: (row.id, column_hash(row._mapping))
+            for row in db.session.execute(
+                sa.select(Recipe.id, Recipe.title, *[getattr(Recipe, c) for c in RECIPE_COLUMNS])
+            )
+        }
+        logger.info(f"{len(existing)} recipes in database")
+
+        upsert = upsert_statement(db.engine.dialect.name)
+        n_read = n_written = 0
+        for chunk in iter_chunks(iter_catalog(), chunk_size):
+            rows = {}
+            for recipe_data in chunk:
+                row = recipe_row(recipe_data)
+                rows[row["title"]] = row
+
+            changed = []
+            for title, row in rows.items():
+                if title not in existing:
+                    # new recipes from the file are always public
+                    row = dict(row, is_public=True)
+                    changed.append(row)
+                    existing[title] = (None, column_hash(row))
+                else:
+                    recipe_id, current = existing[title]
+                    if current != column_hash(row):
+                        changed.append(dict(row, id=recipe_id))
+                        existing[title] = (recipe_id, column_hash(row))
+
+            n_read += len(chunk)
+            if changed:
+                write_rows(upsert, changed)
+                db.session.commit()
+                n_written += len(changed)
+            logger.info(f"{n_read} recipes read, {n_written} written")
+
+        if n_written:
+            bump_catalog_version()
+        return n_written
 
-    logger.info(f"{len(long_descriptions)} recipes with long descriptions.")
+
+def refine_recipe_descriptions():
+    logger.info("Refining recipe descriptions")
 
     client = OpenAI()
 
@@ -149,21 +222,26 @@ def refine_recipe_descriptions():
 
         return completion.choices[0].message.content
 
-    for i, recipe in enumerate(long_descriptions):
-        old_description = recipe.get("description")
-        new_description = edit_recipe_description(recipe)
-        recipes_data[recipe["title"]]["description"] = new_description
-        if i % 5 == 0:
-            logger.info(f"{i} recipes completed.")
-            with open(Config.ROOT_DIR + "/data/recipes.json", "w") as file:
-                json.dump(recipes_data, file)
-
-        if i % 40 == 0:
-            print("Old Description: ", old_description)
-            print("New Description: ", new_description)
-
-    with open(Config.ROOT_DIR + "/data/recipes.json", "w") as file:
-        json.dump(recipes_data, file)
+    n_refined = 0
+
+    def refined_recipes():
+        nonlocal n_refined
+        for recipe in iter_catalog():
+            old_description = recipe.get("description")
+            if old_description is not None and len(old_description) > 300:
+                new_description = edit_recipe_description(recipe)
+                recipe["description"] = new_description
+                if n_refined % 5 == 0:
+                    logger.info(f"{n_refined} recipes completed.")
+                if n_refined % 40 == 0:
+                    print("Old Description: ", old_description)
+                    print("New Description: ", new_description)
+                n_refined += 1
+            yield recipe
+
+    # streamed into a new catalog that replaces the old one when every recipe is done
+    write_catalog(refined_recipes())
+    logger.info(f"{n_refined} recipes with long descriptions refined.")
 
     return True
 
@@ -171,24 +249,12 @@ def refine_recipe_descriptions():
 # %%
 def add_recipe_descriptions():
     logger.info("Adding recipe descriptions")
-    with open(Config.ROOT_DIR + "/data/recipes.json") as file:
-        recipes_data = json.load(file)
-
-    recipes_with_descriptions = [
-        recipe
-        for recipe in recipes_data.values()
-        if recipe.get("description") is not None
-    ]
-    recipes_with_descriptions = [
-        recipe
-        for recipe in recipes_with_descriptions
-        if len(recipe.get("description")) < 200
-    ]
-    recipes_without_descriptions = [
-        recipe for recipe in recipes_data.values() if recipe.get("description") is None
-    ]
-
-    logger.info(f"{len(recipes_without_descriptions)} recipes without descriptions.")
+    # streamed, and every description is appended to the catalog on its own: a
+    # catalog loaded up front and written back would drop what the scraper
+    # appended during the run
+    recipes_without_descriptions = (
+        recipe for recipe in iter_catalog() if recipe.get("description") is None
+    )
 
     client = OpenAI()
 
@@ -237,28 +303,29 @@ def add_recipe_descriptions():
         else:
             return completion.choices[0].message.content
 
+    good_example_titles = {
+        "Miso Fish Chowder",
+        "Nectarine Tart",
+        "Pressure Cooker Kalbi Jjim",
+        "Sesame Tofu With Coconut-Lime Dressing and Spinach",
+        "Walnut Picadillo",
+    }
     good_examples = [
-        recipes_data["Miso Fish Chowder"],
-        recipes_data["Nectarine Tart"],
-        recipes_data["Pressure Cooker Kalbi Jjim"],
-        recipes_data["Sesame Tofu With Coconut-Lime Dressing and Spinach"],
-        recipes_data["Walnut Picadillo"],
+        recipe for recipe in iter_catalog() if recipe["title"] in good_example_titles
     ]
+    n_described = 0
     for i, recipe in enumerate(recipes_without_descriptions):
         examples = random.sample(good_examples, 2)
         examples = []
-        description = get_recipe_description(recipe, examples)
-        recipes_data[recipe["title"]]["description"] = description
-        recipe["description"] = description
+        recipe["description"] = get_recipe_description(recipe, examples)
+        append_recipe(recipe)
+        n_described += 1
         if i % 5 == 0:
             logger.info(f"{i} recipes completed.")
             # est_price = char_to_price(len(str(messages)))
             # logger.info(f"Estimated prcie for this recipe: {est_price}. Estimated total price: {est_price * len(recipes_without_descriptions)}")
-            with open(Config.ROOT_DIR + "/data/recipes.json", "w") as file:
-                json.dump(recipes_data, file)
 
-    with open(Config.ROOT_DIR + "/data/recipes.json", "w") as file:
-        json.dump(recipes_data, file)
+    logger.info(f"{n_described} recipes described.")
 
 
 # %%
@@ -272,11 +339,15 @@ def clear_recipes(override=False):
     with app.app_context():
         db.session.query(Recipe).delete()
         db.session.commit()
+        bump_catalog_version()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process some integers.")
     parser.add_argument("--clear", action="store_true", help="Clear all recipes")
+    parser.add_argument(
+        "--chunk-size", type=int, default=1_000, help="Rows per upsert and commit"
+    )
     args = parser.parse_args()
 
     if args.clear:
@@ -284,4 +355,4 @@ if __name__ == "__main__":
     else:
         # add_recipe_descriptions()
         # refine_recipe_descriptions()
-        add_recipes_to_db()
+        add_recipes_to_db(chunk_size=args.chunk_size)
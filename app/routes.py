@@ -33,9 +33,17 @@ from werkzeug.security import check_password_hash
 from app.models import User, Recipe, RecipeList, Favorite, CookBook
 from app.forms import LoginForm, RegistrationForm, SettingsForm
 import datetime
-from sqlalchemy.sql import func
 from app.MailBot import MailBot
 from app.RecipeReader import RecipeReader
+from app.membership import annotate_recipes
+from app.explore_feed import new_seed, private_recipe_ids, load_page, public_count
+from app.catalog import get_recipe_dicts, bump_catalog_version
+from app.search_cache import search_cache
+from app.typeahead import typeahead
+from app.shopping_list import build_shopping_list, split_columns
+from app.text_index import recipe_text_index
+from app.semantic_search import semantic_search, search_recipe_ids
+from app.fulltext import fulltext
 import os
 
 
@@ -64,14 +72,14 @@ def explore():
 
 @app.route("/api/refresh-explore", methods=["GET"])
 def refresh_explore_api():
-    session.pop("explore_recipes", None)
+    session.pop("explore_seed", None)
     return jsonify({"status": "success"})
 
 
 @app.route("/refresh-explore", methods=["GET"])
 @login_required
 def refresh_explore():
-    session.pop("explore_recipes", None)
+    session.pop("explore_seed", None)
     return jsonify({"status": "success"})
 
 
@@ -79,37 +87,24 @@ def refresh_explore():
 @login_required
 def load_more_recipes(page):
     per_page = 12  # Adjust as needed
-    max_pages = 10
 
-    if "explore_recipes" not in session:
-        recipes = (
-            Recipe.query.filter(
-                (Recipe.is_public == True) | (Recipe.author == str(current_user.id))
-            )
-            .order_by(func.random())
-            .limit(per_page * max_pages)
-        )
-        session["explore_recipes"] = [recipe.to_dict() for recipe in recipes]
-        # recipes = Recipe.query.paginate(page=page, per_page=per_page, error_out=False).items
-
-    recipes = session["explore_recipes"][per_page * (page - 1) : per_page * page]
-
-    for recipe in recipes:
-
-        recipe_list_item = RecipeList.query.filter_by(
-            user_id=current_user.id, recipe_id=recipe["id"]
-        ).first()
-        if recipe_list_item:
-            recipe["in_recipe_list"] = True
-        else:
-            recipe["in_recipe_list"] = False
-        favorite_item = Favorite.query.filter_by(
-            user_id=current_user.id, recipe_id=recipe["id"]
-        ).first()
-        if favorite_item:
-            recipe["in_favorites"] = True
-        else:
-            recipe["in_favorites"] = False
+    if "explore_seed" not in session:
+        session["explore_seed"] = new_seed()
+        session["explore_n_public"] = public_count()
+        session["explore_n_private"] = len(private_recipe_ids(current_user.id))
+
+    # only counts in the session: the user's own recipes are looked up again,
+    # the ones added since the session started left out
+    n_private = session.get("explore_n_private", 0)
+    recipes = load_page(
+        session["explore_seed"],
+        page,
+        per_page,
+        private_recipe_ids(current_user.id, limit=n_private),
+        session.get("explore_n_public"),
+        n_private,
+    )
+    recipes = annotate_recipes(recipes, current_user.id)
 
     return render_template("recipe_partial.html", recipes=recipes)
 
@@ -119,21 +114,23 @@ def load_more_recipes(page):
 def load_more_recipes_api():
     page = int(request.args.get("page", 1))
     per_page = 6  # Adjust as needed
-    max_pages = 10
 
-    if "explore_recipes" not in session:
-        recipes = (
-            Recipe.query.filter(
-                (Recipe.is_public == True) | (Recipe.author == str(jwt_current_user.id))
-            )
-            .order_by(func.random())
-            .limit(per_page * max_pages)
-        )
-
-        session["explore_recipes"] = recipes
-        # recipes = Recipe.query.paginate(page=page, per_page=per_page, error_out=False).items
-
-    recipes = session["explore_recipes"][per_page * (page - 1) : per_page * page]
+    if "explore_seed" not in session:
+        session["explore_seed"] = new_seed()
+        session["explore_n_public"] = public_count()
+        session["explore_n_private"] = len(private_recipe_ids(jwt_current_user.id))
+
+    # only counts in the session: the user's own recipes are looked up again,
+    # the ones added since the session started left out
+    n_private = session.get("explore_n_private", 0)
+    recipes = load_page(
+        session["explore_seed"],
+        page,
+        per_page,
+        private_recipe_ids(jwt_current_user.id, limit=n_private),
+        session.get("explore_n_public"),
+        n_private,
+    )
     recipes = jwt_current_user.tag_recipes(recipes, as_json=True)
 
     return jsonify({"recipes": recipes})
@@ -533,25 +530,7 @@ def get_favorites_api():
 @jwt_required()
 def get_cooked_api():
     user = jwt_current_user
-    cooked = user.cooked_recipes
-
-    # TODO: bad way to do this
-    favorites = Favorite.query.filter_by(user_id=user.id).all()
-    favorites = [favorite.recipe for favorite in favorites]
-
-    for recipe in cooked:
-        recipe_list_item = RecipeList.query.filter_by(
-            user_id=user.id, recipe_id=recipe.id
-        ).first()
-
-        if recipe_list_item:
-            recipe.in_recipe_list = True
-        else:
-            recipe.in_recipe_list = False
-        if recipe in favorites:
-            recipe.in_favorites = True
-        else:
-            recipe.in_favorite = False
+    cooked = annotate_recipes(user.cooked_recipes, user.id, as_json=True)
 
     return jsonify({"cooked": cooked})
 
@@ -559,32 +538,16 @@ def get_cooked_api():
 @app.route("/saved")
 @login_required
 def saved():
-    favorites = Favorite.query.filter_by(user_id=current_user.id).all()
-    favorites = [favorite.recipe for favorite in favorites]
-    for recipe in favorites:
-        recipe_list_item = RecipeList.query.filter_by(
-            user_id=current_user.id, recipe_id=recipe.id
-        ).first()
-        if recipe_list_item:
-            recipe.in_recipe_list = True
-        else:
-            recipe.in_recipe_list = False
-        recipe.in_favorites = True
-
+    favorites = (
+        Recipe.query.join(Favorite, Favorite.recipe_id == Recipe.id)
+        .filter(Favorite.user_id == current_user.id)
+        .all()
+    )
     cooked = current_user.cooked_recipes
-    for recipe in cooked:
-        recipe_list_item = RecipeList.query.filter_by(
-            user_id=current_user.id, recipe_id=recipe.id
-        ).first()
 
-        if recipe_list_item:
-            recipe.in_recipe_list = True
-        else:
-            recipe.in_recipe_list = False
-        if recipe in favorites:
-            recipe.in_favorites = True
-        else:
-            recipe.in_favorite = False
+    # one membership query covers both sections
+    annotate_recipes(favorites + cooked, current_user.id)
+
     favorites = [recipe.to_dict() for recipe in favorites]
     cooked = [recipe.to_dict() for recipe in cooked]
     return render_template("saved.html", favorites=favorites, cooked=cooked)
@@ -593,20 +556,12 @@ def saved():
 @app.route("/recipe-list")
 @login_required
 def recipe_list():
-    recipe_list = RecipeList.query.filter_by(user_id=current_user.id).all()
-    recipes = []
-    for recipe_list_item in recipe_list:
-
-        recipe = recipe_list_item.recipe
-        recipe.in_recipe_list = True
-        favorite_item = Favorite.query.filter_by(
-            user_id=current_user.id, recipe_id=recipe.id
-        ).first()
-        if favorite_item:
-            recipe.in_favorites = True
-        else:
-            recipe.in_favorites = False
-        recipes.append(recipe.to_dict())
+    recipes = (
+        Recipe.query.join(RecipeList, RecipeList.recipe_id == Recipe.id)
+        .filter(RecipeList.user_id == current_user.id)
+        .all()
+    )
+    recipes = annotate_recipes(recipes, current_user.id, as_json=True)
     return render_template("recipe_list.html", recipes=recipes)
 
 
@@ -664,25 +619,8 @@ def load_meal_plan():
 @app.route("/api/get-shopping-list", methods=["GET"])
 @jwt_required()
 def shopping_list_api():
-    # TODO: ugly
-    with open("data/ingredient2category.json", "r") as f:
-        ingredient2category = json.load(f)
-
     recipes = jwt_current_user.get_recipe_list(as_json=True)
-
-    ingredient_dict = {}
-
-    n_ingredients = 0
-    for recipe in recipes:
-        for ingredient in recipe["ingredients"]:
-            category = ingredient2category.get(ingredient, "Other")
-            ingredient_dict[category] = ingredient_dict.get(category, []) + [ingredient]
-            n_ingredients += 1
-
-    # Sort ingredient_dict by category, with "Other" category last
-    ingredient_dict = dict(
-        sorted(ingredient_dict.items(), key=lambda x: (x[0] == "Other", x[0]))
-    )
+    ingredient_dict = build_shopping_list(recipes)
 
     return jsonify(ingredient_dict)
 
@@ -690,46 +628,10 @@ def shopping_list_api():
 @app.route("/shopping-list")
 @login_required
 def shopping_list():
-    # TODO: ugly
-    with open("data/ingredient2category.json", "r") as f:
-        ingredient2category = json.load(f)
-
     recipes = current_user.get_recipe_list(as_json=True)
+    ingredient_dict = build_shopping_list(recipes)
 
-    ingredient_dict = {}
-
-    n_ingredients = 0
-    for recipe in recipes:
-        for ingredient in recipe["ingredients"]:
-            category = ingredient2category.get(ingredient, "Other")
-            ingredient_dict[category] = ingredient_dict.get(category, []) + [ingredient]
-            n_ingredients += 1
-
-    # Sort ingredient_dict by category, with "Other" category last
-    ingredient_dict = dict(
-        sorted(ingredient_dict.items(), key=lambda x: (x[0] == "Other", x[0]))
-    )
-
-    # dict_list = [{}, {}, {}]
-    # running_dict = {}
-    # limit = n_ingredients / 3
-    # ingredient_counter = 0
-    # dict_counter = 0
-    # for category, ingredients in ingredient_dict.items():
-    #     running_dict[category] = ingredients
-    #     ingredient_counter += len(ingredients)
-    #     dict_list[dict_counter] = running_dict
-    #     if (ingredient_counter > limit) & (dict_counter < 2):
-    #         running_dict = {}
-    #         ingredient_counter = 0
-    #         dict_counter += 1
-    dict_list = [{}, {}, {}]
-    counter = 0
-    for category, ingredients in ingredient_dict.items():
-        dict_list[counter][category] = ingredients
-        counter += 1
-        if counter == 3:
-            counter = 0
+    dict_list = split_columns(ingredient_dict, 3)
     return render_template(
         "shopping_list.html",
         ingredient_dict=ingredient_dict,
@@ -762,38 +664,100 @@ def search_api():
     query = request.json["query"]
     page = request.json.get("page", None)
 
-    if ("search_recipes" not in session) or (query != session["search_query"]):
-        recipes = Recipe.query.filter(
-            ((Recipe.is_public == True) | (Recipe.author == str(jwt_current_user.id)))
-            & (Recipe.title.ilike(f"%{query}%"))
-        ).all()
-        session["search_query"] = query
-        session["search_recipes"] = recipes
-
-    recipes = session["search_recipes"]
-    if page is not None:
-        start_idx = per_page * (page - 1)
-        if start_idx > len(recipes):
-            return jsonify({"recipes": []})
-        recipes = recipes[start_idx : per_page * page]
+    user_id = jwt_current_user.id if jwt_current_user else None
+    recipe_ids = search_cache.search_page(
+        "fulltext",
+        query,
+        user_id,
+        page,
+        per_page,
+        lambda page, per_page: fulltext.search_ids(query, user_id, page=page, per_page=per_page),
+    )
 
-    recipes = jwt_current_user.tag_recipes(recipes, as_json=True)
+    recipes = get_recipe_dicts(recipe_ids)
+    if jwt_current_user:
+        recipes = jwt_current_user.tag_recipes(recipes, as_json=True)
+
+    return jsonify({"recipes": recipes})
+
+
+@app.route("/api/semantic-search/", methods=["POST"])
+@jwt_required(optional=True)
+def semantic_search_api():
+    """Like /api/search-recipes/, ranked by meaning instead of title substring"""
+
+    per_page = 6  # Adjust as needed
+
+    query = request.json["query"]
+    page = request.json.get("page", None)
+
+    user_id = jwt_current_user.id if jwt_current_user else None
+    # at most MAX_RESULTS ids, so every page is served from the cache
+    recipe_ids = search_cache.search_page(
+        "hybrid",
+        query,
+        user_id,
+        page,
+        per_page,
+        lambda page, per_page: search_recipe_ids(query, user_id),
+    )
+
+    recipes = get_recipe_dicts(recipe_ids)
+    if jwt_current_user:
+        recipes = jwt_current_user.tag_recipes(recipes, as_json=True)
 
     return jsonify({"recipes": recipes})
 
 
+@app.route("/api/typeahead", methods=["GET"])
+@jwt_required(optional=True)
+def typeahead_api():
+    """Title completions for the search box, ?q=<typed text>&n=<count>"""
+    prefix = request.args.get("q", "")
+    n = min(request.args.get("n", 8, type=int), 50)
+    user_id = jwt_current_user.id if jwt_current_user else None
+
+    return jsonify({"completions": typeahead.complete(prefix, user_id, n)})
+
+
+MAX_COOKBOOK_PER_PAGE = 100
+
+
+def cookbook_paging(page, per_page):
+    """
+    Validate the cookbook paging parameters.
+
+    Returns:
+    - (int or None, int, str or None): page, per_page capped at
+      MAX_COOKBOOK_PER_PAGE, and an error message if they are invalid.
+    """
+    try:
+        page = None if page is None else int(page)
+        per_page = int(per_page)
+    except (TypeError, ValueError):
+        return None, None, "page and per_page must be integers"
+    if page is not None and page < 1:
+        return None, None, "page must be 1 or more"
+    if per_page < 1:
+        return None, None, "per_page must be 1 or more"
+    return page, min(per_page, MAX_COOKBOOK_PER_PAGE), None
+
+
 @app.route("/api/search-cookbook/", methods=["POST"])
 @jwt_required()
 def search_cookbook_api():
     query = request.json["query"]
 
-    cookbook_recipes = jwt_current_user.get_cookbook(as_json=True)
+    page, per_page, error = cookbook_paging(
+        request.json.get("page", None), request.json.get("per_page", 24)
+    )
+    if error:
+        return jsonify({"error": error}), 400
 
-    recipes = [
-        recipe
-        for recipe in cookbook_recipes
-        if query.lower() in recipe["title"].lower()
-    ]
+    # without a page the client gets full recipes, it opens them without another request
+    recipes = jwt_current_user.get_cookbook_cards(
+        query, page=page, per_page=per_page, full=page is None
+    )
 
     return jsonify(recipes)
 
@@ -801,28 +765,14 @@ def search_cookbook_api():
 @app.route("/search", methods=["GET"])
 @login_required
 def search():
-    query = request.args.get("q")
-
-    recipes = Recipe.query.filter(
-        ((Recipe.is_public == True) | (Recipe.author == str(current_user.id)))
-        & (Recipe.title.ilike(f"%{query}%"))
-    ).all()
-
-    for recipe in recipes:
-        recipe_list_item = RecipeList.query.filter_by(
-            user_id=current_user.id, recipe_id=recipe.id
-        ).first()
-        if recipe_list_item:
-            recipe.in_recipe_list = True
-        else:
-            recipe.in_recipe_list = False
-        favorite_item = Favorite.query.filter_by(
-            user_id=current_user.id, recipe_id=recipe.id
-        ).first()
-        if favorite_item:
-            recipe.in_favorites = True
-        else:
-            recipe.in_favorites = False
+    query = request.args.get("q", "")
+
+    recipe_ids = fulltext.search_ids(query, current_user.id)
+    recipes_by_id = {
+        recipe.id: recipe for recipe in Recipe.query.filter(Recipe.id.in_(recipe_ids))
+    }
+    recipes = [recipes_by_id[recipe_id] for recipe_id in recipe_ids]
+    recipes = annotate_recipes(recipes, current_user.id)
 
     return render_template("search.html", recipes=recipes, search_term=query)
 
@@ -971,7 +921,14 @@ def cookbook():
 
     user = User.query.get(user_id)
 
-    recipes = user.get_cookbook(as_json=True)
+    page, per_page, error = cookbook_paging(
+        request.args.get("page", None), request.args.get("per_page", 24)
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    # without a page the client gets full recipes, it opens them without another request
+    recipes = user.get_cookbook_cards(page=page, per_page=per_page, full=page is None)
 
     return jsonify({"recipes": recipes}), 200
 
@@ -1059,6 +1016,9 @@ def create_recipe():
         app.logger.exception(f"Error adding recipe to database: {e}")
         db.session.rollback()
         return jsonify({"error": "Error adding recipe to database"}), 500
+    version = bump_catalog_version([recipe.id])
+    semantic_search.index_recipe(recipe)
+    recipe_text_index.update(recipe, version)
 
     return jsonify({"message": "Recipe added successfully", "id": recipe.id}), 200
 
@@ -1091,6 +1051,9 @@ def update_recipe():
         app.logger.error(f"Error updating recipe: {e}")
         db.session.rollback()
         return jsonify({"error": "Error updating recipe"}), 500
+    version = bump_catalog_version([recipe.id])
+    semantic_search.index_recipe(recipe)
+    recipe_text_index.update(recipe, version)
 
     return jsonify({"message": "Recipe updated successfully"}), 200
 
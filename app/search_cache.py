@@ -0,0 +1,127 @@
+"""
+Cache of search results.
+
+The same handful of queries ("chicken", "pasta") are searched by many users.
+Results are stored once in the app cache as ordered recipe id lists,
+keyed by the normalized query and the visibility scope: "public" for users
+whose own recipes are all public anyway, "user:<id>" for users with private
+recipes. Keys include the catalog version, so a new or edited recipe
+invalidates every cached result at once.
+
+Nothing about a result lives in the session: the key is derived from the
+request (query, user and catalog version) alone, so any worker can serve
+any page, re-running the search on a miss. With the default "simple" cache
+every gunicorn worker keeps its own copy, so a result is only shared across
+workers with a shared backend (CACHE_TYPE "FileSystemCache" or
+"RedisCache", see config.py).
+
+Entries expire after SEARCH_TIMEOUT, and each worker evicts the least
+recently used ones beyond MAX_ENTRIES. Recency is tracked in an OrderedDict
+in the worker, not in the cache: a shared index key is what the simple cache
+evicted first, and concurrent requests overwrote each other's copy of it.
+MAX_ENTRIES stays below CACHE_THRESHOLD (config.py), so the simple cache,
+which evicts arbitrary keys once full, never has to. With a shared backend
+each worker evicts by its own recency; Redis with maxmemory-policy
+allkeys-lru evicts by global recency on top of that.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from app import cache
+from app.catalog import catalog_version
+from app.explore_feed import private_recipe_ids
+
+SEARCH_TIMEOUT = 60 * 10
+# result lists per worker, below config.CACHE_THRESHOLD with room for the scope flags
+MAX_ENTRIES = 2_000
+# longer result lists are cut here and deeper pages go to the database
+MAX_CACHED_IDS = 600
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def search_scope(user_id) -> str:
+    """'public' if the user's own recipes add nothing to the public catalog, 'user:<id>' otherwise"""
+    if user_id is None:
+        return "public"
+    key = f"search:private:{catalog_version.get()}:{user_id}"
+    has_private = cache.get(key)
+    if has_private is None:
+        has_private = bool(private_recipe_ids(user_id))
+        cache.set(key, has_private, timeout=SEARCH_TIMEOUT)
+    return f"user:{user_id}" if has_private else "public"
+
+
+class SearchCache:
+    """
+    Parameters:
+    - timeout (int): Seconds a result list is kept.
+    - max_entries (int): Result lists kept before the least recently used are evicted.
+    """
+
+    def __init__(self, timeout=SEARCH_TIMEOUT, max_entries=MAX_ENTRIES):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._recent = OrderedDict()  # key -> None, least recently used first
+        self._lock = threading.Lock()
+
+    def key(self, kind, query, user_id) -> str:
+        digest = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"search:{kind}:{catalog_version.get()}:{search_scope(user_id)}:{digest}"
+
+    def _touch(self, key):
+        with self._lock:
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            evicted = []
+            while len(self._recent) > self.max_entries:
+                evicted.append(self._recent.popitem(last=False)[0])
+        if evicted:
+            cache.delete_many(*evicted)
+
+    def get_or_search(self, kind, query, user_id, search) -> tuple[list, bool]:
+        """
+        The cached results of a search, running it on a miss.
+
+        Parameters:
+        - kind (str): Which search this is, results of different kinds are kept apart.
+        - search (callable): Runs the search, returns all matching ids in order.
+
+        Returns:
+        - (list of int, bool): Up to MAX_CACHED_IDS ids, and whether that is all of them.
+        """
+        key = self.key(kind, query, user_id)
+        cached = cache.get(key)
+        if cached is None:
+            recipe_ids = list(search())
+            cached = (recipe_ids[:MAX_CACHED_IDS], len(recipe_ids) <= MAX_CACHED_IDS)
+            cache.set(key, cached, timeout=self.timeout)
+        self._touch(key)
+        return cached
+
+    def search_page(self, kind, query, user_id, page, per_page, search) -> list[int]:
+        """
+        One page of results, from the cache unless it is past the cached ids.
+
+        Parameters:
+        - page (int): 1-based page, or None for every result.
+        - search (callable): search(page, per_page) runs the uncached search,
+          page None meaning all results.
+        """
+        recipe_ids, complete = self.get_or_search(
+            kind, query, user_id, lambda: search(None, per_page)
+        )
+        if page is None:
+            return recipe_ids if complete else search(None, per_page)
+
+        start = per_page * (page - 1)
+        if start + per_page > len(recipe_ids) and not complete:
+            return search(page, per_page)
+        return recipe_ids[start : start + per_page]
+
+
+search_cache = SearchCache()
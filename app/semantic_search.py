@@ -0,0 +1,209 @@
+"""
+Semantic recipe search.
+
+Queries are embedded with the memory-mapped word vectors (src/embedding_store)
+and matched against a RecipeIndex of recipe embeddings keyed by Recipe.id
+(src/recipe_index). Both are opened once per worker, on the first search,
+and shared with every request after that.
+
+Recipes created or edited through the API are embedded right away and
+added to the delta tier of the index, so they are searchable without a
+rebuild. Once the delta grows past COMPACT_AFTER changes, a background
+thread folds it into a new base index.
+
+search_recipe_ids fuses these neighbours with BM25 matches from the
+in-process text index (app/text_index), so exact words in a title or an
+ingredient list count as well as meaning. When neither finds anything, it
+falls back to the database full-text search (app/fulltext).
+
+Build the index with: python -m scripts.build_recipe_index
+"""
+
+import logging
+import threading
+
+import sqlalchemy as sa
+
+from config import Config
+from app import db
+from app.models import Recipe
+from app.catalog import visible_to
+from app.fulltext import fulltext
+from app.text_index import recipe_text_index
+from src.embedding_store import EmbeddingStore, embed_texts
+from src.recipe_index import TieredRecipeIndex, embed_recipes
+
+logger = logging.getLogger(__name__)
+
+# results per query; later pages come from the search cache (below MAX_CACHED_IDS)
+MAX_RESULTS = 300
+# delta changes that trigger a background compaction
+COMPACT_AFTER = 500
+# share of the lexical score in the fused ranking
+LEXICAL_WEIGHT = 0.5
+
+
+def visible_ids(recipe_ids, user_id) -> list[int]:
+    """the recipe_ids user_id may see, in the same order"""
+    if not recipe_ids:
+        return []
+    visible = set(
+        db.session.scalars(
+            sa.select(Recipe.id).where(Recipe.id.in_(recipe_ids) & visible_to(user_id))
+        )
+    )
+    return [recipe_id for recipe_id in recipe_ids if recipe_id in visible]
+
+
+def title_search_ids(query, user_id) -> list[int]:
+    """ids of the recipes visible to user_id whose title contains query"""
+    return db.session.scalars(
+        sa.select(Recipe.id).where(
+            visible_to(user_id) & (Recipe.title.ilike(f"%{query}%"))
+        )
+    ).all()
+
+
+class SemanticSearch:
+    """
+    Lazily opened embedding store and recipe index.
+
+    Parameters:
+    - store_path (str): Directory of the EmbeddingStore.
+    - index_path (str): Directory of the RecipeIndex.
+    """
+
+    def __init__(self, store_path, index_path):
+        self.store_path = store_path
+        self.index_path = index_path
+        self.store = None
+        self.index = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._compacting = None
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if EmbeddingStore.exists(self.store_path):
+                self.store = EmbeddingStore.open(self.store_path)
+                self.index = TieredRecipeIndex(self.index_path)
+            else:
+                logger.warning(
+                    "Semantic search disabled: no embedding store, searching titles only"
+                )
+            self._loaded = True
+
+    @property
+    def available(self) -> bool:
+        self._load()
+        return self.index is not None
+
+    def nearest(self, query, limit=MAX_RESULTS):
+        """
+        The recipes nearest to query, visible to anyone or not.
+
+        Returns:
+        - list of (int, float): (Recipe.id, distance), or None if the query can't be embedded.
+        """
+        if not self.available:
+            return None
+        embeddings, found = embed_texts(self.store, [query])
+        if not found[0]:
+            return None
+        return self.index.search(embeddings[0], limit)
+
+    def search_ids(self, query, user_id, limit=MAX_RESULTS):
+        """
+        Recipe ids visible to user_id, nearest to query first.
+
+        Returns:
+        - list of int, or None if the query can't be embedded.
+        """
+        hits = self.nearest(query, limit)
+        if hits is None:
+            return None
+        return visible_ids([recipe_id for recipe_id, _ in hits], user_id)
+
+    def index_recipe(self, recipe: Recipe):
+        """Make a new or edited recipe searchable right away"""
+        if not self.available:
+            return
+        try:
+            vector = embed_recipes(self.store, [recipe.to_dict()])[0]
+            self.index.upsert(recipe.id, vector)
+        except Exception:
+            # the recipe is saved either way, it will be in the next full build
+            logger.exception(f"Could not index recipe {recipe.id}")
+            return
+        self._compact_if_needed()
+
+    def remove_recipe(self, recipe_id):
+        if not self.available:
+            return
+        self.index.remove(recipe_id)
+        self._compact_if_needed()
+
+    def _compact_if_needed(self):
+        if self.index.delta_size < COMPACT_AFTER:
+            return
+        if self._compacting is not None and self._compacting.is_alive():
+            return
+        self._compacting = threading.Thread(target=self._compact, daemon=True)
+        self._compacting.start()
+
+    def _compact(self):
+        try:
+            if self.index.compact():
+                logger.info("Compacted the recipe index")
+        except Exception:
+            logger.exception("Recipe index compaction failed")
+
+
+semantic_search = SemanticSearch(Config.EMBEDDING_STORE_PATH, Config.RECIPE_INDEX_PATH)
+
+
+def fuse(lexical, semantic, lexical_weight=LEXICAL_WEIGHT) -> list[int]:
+    """
+    Merge BM25 matches and embedding neighbours into one ranking.
+
+    BM25 scores are scaled by the best one, distances are turned into
+    similarities between 0 (farthest candidate) and 1 (nearest), and each
+    recipe gets the weighted sum. A recipe found by only one side gets 0 from
+    the other.
+
+    Parameters:
+    - lexical (list of (int, float)): (Recipe.id, BM25 score) pairs.
+    - semantic (list of (int, float)): (Recipe.id, distance) pairs.
+
+    Returns:
+    - list of int: Recipe ids, best first.
+    """
+    scores = {}
+    if lexical:
+        best = max(score for _, score in lexical) or 1.0
+        for recipe_id, score in lexical:
+            scores[recipe_id] = lexical_weight * score / best
+    if semantic:
+        nearest = min(distance for _, distance in semantic)
+        spread = max(distance for _, distance in semantic) - nearest
+        for recipe_id, distance in semantic:
+            similarity = 1 - (distance - nearest) / spread if spread else 1.0
+            scores[recipe_id] = scores.get(recipe_id, 0.0) + (1 - lexical_weight) * similarity
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def search_recipe_ids(query, user_id) -> list[int]:
+    """
+    Recipes visible to user_id ranked by fused text and embedding relevance,
+    or database full-text matches when neither index finds anything.
+    """
+    lexical = recipe_text_index.search(query, MAX_RESULTS)
+    semantic = semantic_search.nearest(query, MAX_RESULTS) or []
+    recipe_ids = visible_ids(fuse(lexical, semantic)[:MAX_RESULTS], user_id)
+    if not recipe_ids:
+        recipe_ids = fulltext.search_ids(query, user_id)
+    return recipe_ids
@@ -0,0 +1,71 @@
+"""
+Shopping list assembly.
+
+Turns the recipes on a user's list into ingredient lines grouped by store
+category. Lines for the same ingredient in convertible units are summed
+("1 cup flour" + "2 tablespoons flour" -> "1 1/8 cups flour"), and identical
+lines that can't be summed are merged into one entry with a count.
+Everything here is a single pass over the ingredients.
+"""
+
+from app.categorizer import ingredient_categorizer, OTHER
+from app.ingredient_parser import consolidate_ingredients
+
+
+def group_ingredients(ingredients: list[str], categories: list[str]) -> dict:
+    """
+    Group ingredient lines by category, merging identical lines.
+
+    Parameters:
+    - ingredients (list of str): Ingredient lines, in recipe order.
+    - categories (list of str): The category of each line.
+
+    Returns:
+    - dict: category -> list of display strings, "line (xN)" for a line seen
+      N times, categories sorted by name with OTHER last.
+    """
+    grouped = {}  # category -> line key -> [first text seen, count], in first-seen order
+    for ingredient, category in zip(ingredients, categories):
+        entries = grouped.get(category)
+        if entries is None:
+            entries = grouped[category] = {}
+        # lines that only differ in case or spacing are the same line; most
+        # are spaced normally already and splitting them all triples the cost
+        key = ingredient.lower()
+        if "  " in key or "\t" in key or key != key.strip():
+            key = " ".join(key.split())
+        entry = entries.get(key)
+        if entry is None:
+            entries[key] = [ingredient, 1]
+        else:
+            entry[1] += 1
+
+    return {
+        category: [text if count == 1 else f"{text} (x{count})" for text, count in entries.values()]
+        for category, entries in sorted(grouped.items(), key=lambda x: (x[0] == OTHER, x[0]))
+    }
+
+
+def split_columns(grouped: dict, n_columns=3) -> list[dict]:
+    """deal categories out round-robin into n_columns dicts"""
+    columns = [{} for _ in range(n_columns)]
+    for i, (category, items) in enumerate(grouped.items()):
+        columns[i % n_columns][category] = items
+    return columns
+
+
+def build_shopping_list(recipes: list[dict], categorizer=ingredient_categorizer) -> dict:
+    """
+    Shopping list for a list of recipe dicts.
+
+    Returns:
+    - dict: category -> list of display strings.
+    """
+    ingredients = [
+        ingredient for recipe in recipes for ingredient in recipe["ingredients"]
+    ]
+    consolidated = consolidate_ingredients(ingredients)
+
+    # summed entries take the category of the first line that went into them
+    categories = categorizer.categorize([entry.lines[0] for entry in consolidated])
+    return group_ingredients([entry.display() for entry in consolidated], categories)
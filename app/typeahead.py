@@ -0,0 +1,228 @@
+"""
+Title autocomplete without the database.
+
+Each worker keeps the public recipe titles in two sorted arrays: one of
+whole titles, and one of every title with its leading words dropped ("noodle
+soup", "soup" for "Chicken Noodle Soup"). A completion is a bisect into each
+array followed by a short walk, so keystroke-level lookups take
+microseconds. Titles that start with the typed text come before titles
+where a later word does.
+
+Private recipes go into small per-user overlays built on demand. When the
+catalog version changes, the recipes it changed are looked up in the
+catalog's change log: only the overlays of their authors are dropped, and
+the base arrays, if any public recipe changed, are rebuilt in a background
+thread while the old ones keep serving, as RecipeTextIndex does.
+"""
+
+import logging
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+import sqlalchemy as sa
+
+from app import app, db
+from app.models import Recipe
+from app.catalog import catalog_version
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(_NON_WORD.split((title or "").lower())).strip()
+
+
+class TitleIndex:
+    """
+    Sorted prefix arrays over (recipe_id, title) pairs.
+
+    Parameters:
+    - titles (iterable of (int, str)): Recipe ids and titles.
+    """
+
+    def __init__(self, titles):
+        self.titles = {}
+        whole, later = [], []
+        for recipe_id, title in titles:
+            self.titles[recipe_id] = title
+            words = normalize_title(title).split()
+            if not words:
+                continue
+            whole.append((" ".join(words), recipe_id))
+            later.extend((" ".join(words[i:]), recipe_id) for i in range(1, len(words)))
+        whole.sort()
+        later.sort()
+        self._tiers = [
+            ([key for key, _ in whole], [recipe_id for _, recipe_id in whole]),
+            ([key for key, _ in later], [recipe_id for _, recipe_id in later]),
+        ]
+
+    def __len__(self):
+        return len(self.titles)
+
+    def matches(self, prefix: str, n: int) -> list[tuple[int, str, int]]:
+        """
+        Up to n matches per tier.
+
+        Returns:
+        - list of (tier, key, recipe_id): tier 0 for title starts, 1 for later words.
+        """
+        output = []
+        for tier, (keys, ids) in enumerate(self._tiers):
+            seen = set()
+            i = bisect_left(keys, prefix)
+            while i < len(keys) and len(seen) < n and keys[i].startswith(prefix):
+                if ids[i] not in seen:
+                    seen.add(ids[i])
+                    output.append((tier, keys[i], ids[i]))
+                i += 1
+        return output
+
+
+class Typeahead:
+    """
+    Completions over the public catalog plus the user's private recipes.
+
+    Parameters:
+    - version (CatalogVersion): Catch up with the recipes it changed when it moves.
+    - max_overlays (int): Per-user overlays kept, least recently used dropped first.
+    """
+
+    def __init__(self, version, max_overlays=256):
+        self.version = version
+        self.max_overlays = max_overlays
+        self._version = None
+        self._base = None
+        self._overlays = OrderedDict()
+        self._lock = threading.Lock()
+        self._rebuilding = None
+        self._rebuild_again = False
+
+    def _build_base(self) -> TitleIndex:
+        return TitleIndex(
+            db.session.execute(sa.select(Recipe.id, Recipe.title).where(Recipe.is_public == True))
+        )
+
+    def _rebuild_in_background(self):
+        """call with the lock held"""
+
+        def rebuild():
+            while True:
+                try:
+                    with app.app_context():
+                        base = self._build_base()
+                    self._base = base
+                except Exception:
+                    logger.exception("Rebuilding the typeahead index failed")
+                # a change that came in during the build may not be in it
+                with self._lock:
+                    if not self._rebuild_again:
+                        self._rebuilding = None
+                        return
+                    self._rebuild_again = False
+
+        if self._rebuilding is not None:
+            self._rebuild_again = True
+        else:
+            self._rebuilding = threading.Thread(target=rebuild, daemon=True)
+            self._rebuilding.start()
+
+    def _check_version(self):
+        if self.version.get() == self._version:
+            return
+        with self._lock:
+            version, changed = self.version.changes_since(self._version)
+            if version == self._version:
+                return
+            if changed is None:
+                self._overlays.clear()
+                stale_base = True
+            else:
+                rows = db.session.execute(
+                    sa.select(Recipe.id, Recipe.author, Recipe.is_public).where(
+                        Recipe.id.in_(changed)
+                    )
+                ).all()
+                authors = {str(row.author) for row in rows if not row.is_public}
+                for user_id, overlay in list(self._overlays.items()):
+                    # deleted recipes have no row, so also drop overlays that held them
+                    if str(user_id) in authors or any(i in overlay.titles for i in changed):
+                        del self._overlays[user_id]
+                stale_base = self._base is not None and (
+                    any(row.is_public for row in rows)
+                    or any(i in self._base.titles for i in changed)
+                )
+            if stale_base and self._base is not None:
+                self._rebuild_in_background()
+            self._version = version
+
+    def base(self) -> TitleIndex:
+        self._check_version()
+        if self._base is None:
+            with self._lock:
+                if self._base is None:
+                    self._base = self._build_base()
+        return self._base
+
+    def overlay(self, user_id) -> TitleIndex:
+        self._check_version()
+        if user_id in self._overlays:
+            self._overlays.move_to_end(user_id)
+            return self._overlays[user_id]
+
+        overlay = TitleIndex(
+            db.session.execute(
+                sa.select(Recipe.id, Recipe.title).where(
+                    Recipe.author == str(user_id),
+                    sa.func.coalesce(Recipe.is_public, False) == False,
+                )
+            )
+        )
+        self._overlays[user_id] = overlay
+        if len(self._overlays) > self.max_overlays:
+            self._overlays.popitem(last=False)
+        return overlay
+
+    def complete(self, prefix: str, user_id=None, n=8) -> list[dict]:
+        """
+        The top n titles for what the user has typed so far.
+
+        Parameters:
+        - prefix (str): The typed text.
+        - user_id (int): Include this user's private recipes, None for public only.
+        - n (int): Number of completions.
+
+        Returns:
+        - list of dict: {"id", "title"}, title starts first, then alphabetical.
+        """
+        prefix = normalize_title(prefix)
+        if not prefix:
+            return []
+
+        indexes = [self.base()]
+        if user_id is not None:
+            indexes.append(self.overlay(user_id))
+
+        candidates = sorted(
+            (
+                (tier, key, recipe_id, index)
+                for index in indexes
+                for tier, key, recipe_id in index.matches(prefix, n)
+            ),
+            key=lambda candidate: candidate[:3],
+        )
+        output, seen = [], set()
+        for _, _, recipe_id, index in candidates:
+            if recipe_id not in seen:
+                seen.add(recipe_id)
+                output.append({"id": recipe_id, "title": index.titles[recipe_id]})
+                if len(output) == n:
+                    break
+        return output
+
+
+typeahead = Typeahead(catalog_version)
@@ -30,8 +30,20 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY")
     S3_BUCKET = os.environ.get("S3_BUCKET")
     SESSION_TYPE = "filesystem"
-    CACHE_TYPE = "simple"
+    # per worker by default; "FileSystemCache" with CACHE_DIR, or "RedisCache"
+    # with CACHE_REDIS_URL, shares cached search results across workers
+    CACHE_TYPE = os.environ.get("CACHE_TYPE", "simple")
+    CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(ROOT_DIR, "data", "cache"))
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
     CACHE_DEFAULT_TIMEOUT = 300 * 5
+    # entries the simple cache keeps per worker before it evicts arbitrary ones,
+    # kept above search_cache.MAX_ENTRIES (600 ids each, ~5 KB) so that its
+    # LRU eviction is the one that happens
+    CACHE_THRESHOLD = 5_000
+    CATALOG_VERSION_PATH = os.path.join(ROOT_DIR, "data", "catalog_version")
+    INGREDIENT_CATEGORY_PATH = os.path.join(ROOT_DIR, "data", "ingredient2category.json")
+    EMBEDDING_STORE_PATH = os.path.join(ROOT_DIR, "data", "embeddings")
+    RECIPE_INDEX_PATH = os.path.join(ROOT_DIR, "data", "recipe_index")
     JWT_SECRET_KEY = SECRET_KEY
     JWT_ACCESS_TOKEN_EXPIRES = datetime.timedelta(0)  # never expires
 
@@ -0,0 +1,71 @@
+"""recipe full text search
+
+Revision ID: 3b7e1c9d2f4a
+Revises: e871240a5210
+Create Date: 2024-05-06 11:02:17.318240
+
+Postgres gets a generated tsvector column with a GIN index, SQLite an FTS5
+table kept in step by triggers. Neither is on the Recipe model, see
+app/fulltext.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c9d2f4a'
+down_revision = 'e871240a5210'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("""
+            ALTER TABLE recipes ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(ingredients, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'C')
+            ) STORED
+        """)
+        op.execute("CREATE INDEX ix_recipes_search_vector ON recipes USING GIN (search_vector)")
+    elif dialect == 'sqlite':
+        op.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+                title, ingredients, description, content='recipes', content_rowid='id'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+                INSERT INTO recipes_fts(rowid, title, ingredients, description)
+                VALUES (new.id, new.title, new.ingredients, new.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+                INSERT INTO recipes_fts(recipes_fts, rowid, title, ingredients, description)
+                VALUES ('delete', old.id, old.title, old.ingredients, old.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE ON recipes BEGIN
+                INSERT INTO recipes_fts(recipes_fts, rowid, title, ingredients, description)
+                VALUES ('delete', old.id, old.title, old.ingredients, old.description);
+                INSERT INTO recipes_fts(rowid, title, ingredients, description)
+                VALUES (new.id, new.title, new.ingredients, new.description);
+            END
+        """)
+        op.execute("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_recipes_search_vector")
+        op.execute("ALTER TABLE recipes DROP COLUMN IF EXISTS search_vector")
+    elif dialect == 'sqlite':
+        for trigger in ('recipes_fts_insert', 'recipes_fts_delete', 'recipes_fts_update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS recipes_fts")
@@ -0,0 +1,13 @@
+"""
+Environment for the benchmarks that import the Flask app.
+
+Importing this before app sets a throwaway secret key, the test config and
+an in-memory SQLite database, unless they are already set. Scripts that
+need another database set DATABASE_URL before importing it.
+"""
+
+import os
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENV", "test")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
@@ -0,0 +1,97 @@
+"""
+Measures recall and latency of the Annoy recipe index against exact search.
+
+Exact top-k neighbours come from brute force over the full matrix. For every
+n_trees in the grid the index is built once (build time, size on disk) and
+queried at every search_k (recall@k, p50/p99 latency per query).
+
+By default the vectors are synthetic clusters shaped like recipe embeddings.
+Pass --vectors with a saved (n, dim) .npy, for example the output of
+src.recipe_index.embed_catalog, to measure the real catalog.
+
+Usage: python -m scripts.bench_ann_index [--vectors data.npy] [--trees 10 100 1000]
+       [--search-k -1 10000 100000] [--k 10] [--queries 200]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from annoy import AnnoyIndex
+
+
+def synthetic_vectors(n, dim, n_clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    labels = rng.integers(n_clusters, size=n)
+    return (centers[labels] + 0.5 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def exact_top_k(vectors, queries, k):
+    """euclidean brute force, same metric as the Annoy index"""
+    squared_norms = (vectors ** 2).sum(axis=1)
+    distances = squared_norms[None, :] - 2 * queries @ vectors.T
+    top = np.argpartition(distances, k, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", help="(n, dim) .npy of recipe embeddings")
+    parser.add_argument("--n", type=int, default=20_000, help="synthetic catalog size")
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--trees", type=int, nargs="+", default=[10, 50, 100, 1000])
+    parser.add_argument("--search-k", type=int, nargs="+", default=[-1, 10_000, 100_000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=-1, help="Annoy build threads")
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    # queries near catalog items, as typed queries land near the recipes they describe
+    sample = rng.choice(len(vectors), size=args.queries, replace=False)
+    queries = vectors[sample] + 0.1 * rng.normal(size=(args.queries, vectors.shape[1]))
+    queries = queries.astype(np.float32)
+
+    truth = exact_top_k(vectors, queries, args.k)
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, {args.queries} queries, k={args.k}")
+    print(f"{'n_trees':>8} {'search_k':>9} {'build s':>8} {'size MB':>8} "
+          f"{'recall':>7} {'p50 ms':>8} {'p99 ms':>8}")
+
+    directory = tempfile.mkdtemp()
+    for n_trees in args.trees:
+        index = AnnoyIndex(vectors.shape[1], metric="euclidean")
+        for item, vector in enumerate(vectors):
+            index.add_item(item, vector)
+        start = time.perf_counter()
+        index.build(n_trees, n_jobs=args.threads)
+        build_seconds = time.perf_counter() - start
+        path = os.path.join(directory, f"{n_trees}.ann")
+        index.save(path)
+        size_mb = os.path.getsize(path) / 1e6
+
+        for search_k in args.search_k:
+            timings, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = index.get_nns_by_vector(query, args.k, search_k=search_k)
+                timings.append(time.perf_counter() - start)
+                hits += len(expected.intersection(found))
+            ms = 1000 * np.array(timings)
+            print(
+                f"{n_trees:>8} {search_k:>9} {build_seconds:>8.2f} {size_mb:>8.1f} "
+                f"{hits / (args.k * len(queries)):>7.3f} "
+                f"{np.percentile(ms, 50):>8.3f} {np.percentile(ms, 99):>8.3f}"
+            )
+        index.unload()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Finds the catalog size where Annoy starts to beat exact search.
+
+For every catalog size in the grid, times ExactRecipeIndex (one matrix-vector
+product per query, and batched) against a RecipeIndex built with the trees
+and search_k the app uses, and reports Annoy's recall against the exact
+answer. src.recipe_index.EXACT_SEARCH_MAX should sit around the size where
+Annoy's p50 drops below exact search.
+
+Usage: python -m scripts.bench_exact_search [--sizes 1000 5000 20000 100000]
+       [--trees 100] [--search-k 100000] [--k 10] [--queries 200]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from scripts.bench_ann_index import synthetic_vectors
+from src.recipe_index import RecipeIndex, ExactRecipeIndex
+
+
+def p50_ms(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - start)
+    return 1000 * np.percentile(timings, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 2_000, 5_000, 10_000, 20_000, 50_000, 100_000]
+    )
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--search-k", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"dim {args.dim}, k={args.k}, annoy: {args.trees} trees, search_k {args.search_k}")
+    print(f"{'size':>8} {'exact ms':>9} {'batched ms':>11} {'annoy ms':>9} {'recall':>7}")
+    crossover = None
+    for size in args.sizes:
+        vectors = synthetic_vectors(size, args.dim)
+        rng = np.random.default_rng(1)
+        sample = rng.choice(size, size=min(args.queries, size), replace=False)
+        queries = (vectors[sample] + 0.1 * rng.normal(size=(len(sample), args.dim))).astype(np.float32)
+
+        ids = np.arange(size)
+        exact = ExactRecipeIndex(ids, vectors)
+        annoy = RecipeIndex.build(ids, vectors, n_trees=args.trees)
+
+        exact_ms = p50_ms(lambda q: exact.search(q, args.k), queries)
+        start = time.perf_counter()
+        truth = exact.search_many(queries, args.k)
+        batched_ms = 1000 * (time.perf_counter() - start) / len(queries)
+        annoy_ms = p50_ms(lambda q: annoy.search(q, args.k, args.search_k), queries)
+
+        hits = sum(
+            len({i for i, _ in expected} & {i for i, _ in annoy.search(q, args.k, args.search_k)})
+            for q, expected in zip(queries, truth)
+        )
+        recall = hits / (args.k * len(queries))
+        print(f"{size:>8} {exact_ms:>9.3f} {batched_ms:>11.3f} {annoy_ms:>9.3f} {recall:>7.3f}")
+        if crossover is None and annoy_ms < exact_ms:
+            crossover = size
+
+    if crossover is None:
+        print("exact search was faster at every size")
+    else:
+        print(f"annoy is faster from about {crossover} recipes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Times full-text recipe search against the title ilike scan.
+
+Fills a recipes table with synthetic recipes (100k by default) and runs the
+same queries through a title ilike filter and app.fulltext (ts_rank on
+Postgres, FTS5 on SQLite), for the first page and a deep page.
+
+Uses DATABASE_URL when set. Run `flask db upgrade` first on Postgres so the
+search_vector column exists; by default a throwaway SQLite file is used.
+
+Usage: python -m scripts.bench_fulltext [--recipes 100000] [--queries 100]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# a file rather than scripts._bench_env's in-memory database
+os.environ.setdefault(
+    "DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+)
+import scripts._bench_env  # noqa: F401, sets up the app before it is imported
+
+import numpy as np
+import sqlalchemy as sa
+
+from app import app, db
+from app.models import Recipe
+from app.catalog import visible_to
+from app.fulltext import fulltext
+from scripts.bench_semantic_search import WORDS
+
+
+def populate(n_recipes, rng, batch_size=10_000):
+    for start in range(0, n_recipes, batch_size):
+        rows = [
+            {
+                "title": f"{' '.join(rng.sample(WORDS, 3))} {i}",
+                "ingredients": ",".join(rng.sample(WORDS, 8)),
+                "description": " ".join(rng.choices(WORDS, k=20)),
+                "instructions": " ".join(rng.choices(WORDS, k=60)),
+                "is_public": True,
+            }
+            for i in range(start, min(start + batch_size, n_recipes))
+        ]
+        db.session.execute(sa.insert(Recipe), rows)
+    db.session.commit()
+
+
+def ilike_ids(query, user_id, page=None, per_page=6):
+    statement = sa.select(Recipe.id).where(
+        visible_to(user_id) & Recipe.title.ilike(f"%{query}%")
+    )
+    if page is not None:
+        statement = statement.limit(per_page).offset(per_page * (page - 1))
+    return db.session.scalars(statement).all()
+
+
+def timed(fn, queries, **kwargs):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query, 1, **kwargs)
+        timings.append(time.perf_counter() - start)
+    ms = 1000 * np.array(timings)
+    return f"p50 {np.percentile(ms, 50):8.2f} ms  p99 {np.percentile(ms, 99):8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with app.app_context():
+        db.create_all()
+        if db.session.scalar(sa.select(sa.func.count(Recipe.id))) < args.recipes:
+            start = time.perf_counter()
+            populate(args.recipes, rng)
+            print(f"inserted {args.recipes} recipes in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        mode = fulltext.mode()
+        print(f"full-text mode: {mode} (ready in {time.perf_counter() - start:.1f}s)")
+
+        queries = [rng.choice(WORDS) for _ in range(args.queries)]
+        for name, fn, kwargs in [
+            ("ilike, all", ilike_ids, {}),
+            ("ilike, page 1", ilike_ids, {"page": 1}),
+            (f"{mode}, all", fulltext.search_ids, {}),
+            (f"{mode}, page 1", fulltext.search_ids, {"page": 1}),
+            (f"{mode}, page 50", fulltext.search_ids, {"page": 50}),
+        ]:
+            print(f"{name:>18}: {timed(fn, queries, **kwargs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Counts the queries needed to tag a page of recipe cards with membership flags.
+
+Compares the old per-card lookups (one RecipeList and one Favorite query per
+card) against app.membership.annotate_recipes on a throwaway in-memory database.
+
+Usage: python -m scripts.bench_membership [--per-page 12] [--pages 10]
+"""
+
+import argparse
+import random
+import time
+
+import scripts._bench_env  # noqa: F401, sets up the app before it is imported
+
+import sqlalchemy as sa
+
+from app import app, db
+from app.models import User, Recipe, RecipeList, Favorite, CookBook
+from app.membership import annotate_recipes
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        sa.event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        sa.event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def legacy_tag(recipes, user_id):
+    """the per-card loop load_more_recipes used before annotate_recipes"""
+    for recipe in recipes:
+        recipe["in_recipe_list"] = (
+            RecipeList.query.filter_by(user_id=user_id, recipe_id=recipe["id"]).first()
+            is not None
+        )
+        recipe["in_favorites"] = (
+            Favorite.query.filter_by(user_id=user_id, recipe_id=recipe["id"]).first()
+            is not None
+        )
+    return recipes
+
+
+def populate(n_recipes=500, seed=0):
+    rng = random.Random(seed)
+    user = User(email="bench@example.com")
+    db.session.add(user)
+    db.session.add_all(
+        Recipe(
+            title=f"Recipe {i}",
+            ingredients="1 cup flour,2 eggs",
+            instructions="Mix.\nBake.",
+            is_public=True,
+        )
+        for i in range(n_recipes)
+    )
+    db.session.flush()
+    ids = range(1, n_recipes + 1)
+    for model in (RecipeList, Favorite, CookBook):
+        db.session.add_all(
+            model(user_id=user.id, recipe_id=i) for i in rng.sample(ids, 40)
+        )
+    db.session.commit()
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--per-page", type=int, default=12)
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        user = populate()
+        pages = [
+            [r.to_dict() for r in Recipe.query.offset(i * args.per_page).limit(args.per_page)]
+            for i in range(args.pages)
+        ]
+
+        for name, tag in [
+            ("per-card queries", legacy_tag),
+            ("annotate_recipes", annotate_recipes),
+        ]:
+            queries = 0
+            start = time.perf_counter()
+            for page in pages:
+                with QueryCounter(db.engine) as counter:
+                    tag([dict(r) for r in page], user.id)
+                queries += counter.count
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:>18}: {queries / len(pages):5.1f} queries/page, "
+                f"{1000 * elapsed / len(pages):6.2f} ms/page"
+            )
+
+
+if __name__ == "__main__":
+    main()
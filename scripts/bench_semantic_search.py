@@ -0,0 +1,104 @@
+"""
+Times semantic search against the title ilike scan.
+
+Builds a throwaway in-memory database of synthetic recipes, a small random
+embedding store over their vocabulary and a RecipeIndex, then runs the same
+queries through app.semantic_search.title_search_ids and
+SemanticSearch.search_ids (embedding, ANN lookup and visibility filter).
+
+Usage: python -m scripts.bench_semantic_search [--recipes 20000] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import scripts._bench_env  # noqa: F401, sets up the app before it is imported
+
+import numpy as np
+
+from app import app, db
+from app.models import Recipe
+from app.semantic_search import SemanticSearch, title_search_ids
+from src.embedding_store import convert_word2vec
+from src.recipe_index import RecipeIndex, embed_recipes
+
+WORDS = (
+    "chicken beef pork tofu salmon shrimp rice pasta noodle soup stew salad "
+    "curry taco burrito pizza bread cake cookie pie tart roasted grilled baked "
+    "fried spicy sweet sour lemon garlic ginger tomato potato mushroom spinach "
+    "cheese chocolate vanilla apple banana berry honey maple coconut basil"
+).split()
+
+
+def populate(n_recipes, rng):
+    db.session.add_all(
+        Recipe(
+            title=f"{' '.join(rng.sample(WORDS, 3))} {i}",
+            category=rng.choice(WORDS),
+            ingredients=",".join(rng.sample(WORDS, 6)),
+            instructions=" ".join(rng.choices(WORDS, k=30)),
+            is_public=rng.random() < 0.95,
+            author="1",
+        )
+        for i in range(n_recipes)
+    )
+    db.session.commit()
+
+
+def write_store(directory, dim, rng):
+    path = os.path.join(directory, "vectors.txt")
+    with open(path, "w") as f:
+        f.write(f"{len(WORDS)} {dim}\n")
+        for word in WORDS:
+            f.write(word + " " + " ".join(f"{rng.gauss(0, 1):.4f}" for _ in range(dim)) + "\n")
+    return convert_word2vec(path, os.path.join(directory, "embeddings"))
+
+
+def percentiles(seconds):
+    ms = 1000 * np.array(seconds)
+    return f"p50 {np.percentile(ms, 50):7.2f} ms  p99 {np.percentile(ms, 99):7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp()
+    store = write_store(directory, args.dim, rng)
+
+    with app.app_context():
+        db.create_all()
+        populate(args.recipes, rng)
+        recipes = [recipe.to_dict() for recipe in Recipe.query]
+        index = RecipeIndex.build(
+            [recipe["id"] for recipe in recipes], embed_recipes(store, recipes)
+        )
+        index.save(os.path.join(directory, "recipe_index"))
+
+        search = SemanticSearch(
+            os.path.join(directory, "embeddings"), os.path.join(directory, "recipe_index")
+        )
+        queries = [" ".join(rng.sample(WORDS, 2)) for _ in range(args.queries)]
+        search.search_ids(queries[0], 1)  # open the files
+
+        for name, fn in [
+            ("title ilike", title_search_ids),
+            ("semantic", search.search_ids),
+        ]:
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                fn(query, 1)
+                timings.append(time.perf_counter() - start)
+            print(f"{name:>12}: {percentiles(timings)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Times shopping list grouping for a large recipe list.
+
+Compares the old copy-on-append grouping from the shopping list routes with
+app.shopping_list.group_ingredients on recipes built from lines in
+data/ingredient2category.json.
+
+Usage: python -m scripts.bench_shopping_list [--recipes 50] [--repeat 200]
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+import scripts._bench_env  # noqa: F401, sets up the app before it is imported
+
+from config import Config
+from app.categorizer import ingredient_categorizer
+from app.shopping_list import group_ingredients, build_shopping_list
+
+
+def legacy_group(ingredients, categories):
+    ingredient_dict = {}
+    for ingredient, category in zip(ingredients, categories):
+        ingredient_dict[category] = ingredient_dict.get(category, []) + [ingredient]
+    return dict(sorted(ingredient_dict.items(), key=lambda x: (x[0] == "Other", x[0])))
+
+
+def synthetic_recipes(n_recipes, lines_per_recipe=12, seed=0):
+    rng = random.Random(seed)
+    with open(Config.INGREDIENT_CATEGORY_PATH) as f:
+        lines = list(json.load(f))
+    # a pantry of common lines so that recipes share some of them
+    pantry = rng.sample(lines, 40)
+    recipes = []
+    for _ in range(n_recipes):
+        ingredients = rng.sample(lines, lines_per_recipe - 3) + rng.sample(pantry, 3)
+        recipes.append({"ingredients": ingredients})
+    return recipes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    recipes = synthetic_recipes(args.recipes)
+    ingredients = [i for recipe in recipes for i in recipe["ingredients"]]
+    categories = ingredient_categorizer.categorize(ingredients)
+
+    grouped = group_ingredients(ingredients, categories)
+    n_entries = sum(len(items) for items in grouped.values())
+    print(f"{args.recipes} recipes, {len(ingredients)} lines -> {n_entries} entries")
+
+    for name, fn in [
+        ("legacy grouping", lambda: legacy_group(ingredients, categories)),
+        ("group_ingredients", lambda: group_ingredients(ingredients, categories)),
+        ("build_shopping_list", lambda: build_shopping_list(recipes)),
+    ]:
+        seconds = timeit.timeit(fn, number=args.repeat) / args.repeat
+        print(f"{name:>20}: {1e6 * seconds:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
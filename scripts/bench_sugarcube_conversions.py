@@ -0,0 +1,78 @@
+"""
+Times unit conversions through sugarcube.
+
+Converts the same 100k random amounts with Amount.to (Converter closures and
+a new Amount per call), with the compiled ConversionTable one value at a time,
+and with its vectorized numpy paths.
+
+Usage: python -m scripts.bench_sugarcube_conversions [--n 100000]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from src import sugarcube as sc
+
+UNITS = [
+    sc.Volume.teaspoon,
+    sc.Volume.tablespoon,
+    sc.Volume.cup,
+    sc.Volume.milliliter,
+    sc.Volume.quart,
+    sc.Volume.fluidOunce,
+]
+
+
+def timed(name, fn, n):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>32}: {elapsed * 1000:8.1f} ms  ({n / elapsed:12,.0f} amounts/s)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    values = [rng.uniform(0.1, 10) for _ in range(args.n)]
+    units = [rng.choice(UNITS) for _ in range(args.n)]
+    target = sc.Volume.cup
+
+    closures = timed(
+        "Amount.to",
+        lambda: [sc.Amount(v, u).to(target).value for v, u in zip(values, units)],
+        args.n,
+    )
+    compiled = timed(
+        "ConversionTable.convert",
+        lambda: [sc.conversions.convert(v, u, target) for v, u in zip(values, units)],
+        args.n,
+    )
+    codes = np.array([sc.conversions.code(u) for u in units])
+    vectorized = timed(
+        "ConversionTable.convert_codes",
+        lambda: sc.conversions.convert_codes(values, codes, target),
+        args.n,
+    )
+    timed(
+        "convert_many (one unit)",
+        lambda: sc.conversions.convert_many(values, sc.Volume.tablespoon, target),
+        args.n,
+    )
+    timed(
+        "convert_many (volume -> mass)",
+        lambda: sc.conversions.convert_many(values, sc.Volume.cup, sc.Mass.gram, sc.Flour),
+        args.n,
+    )
+
+    assert np.allclose(closures, compiled) and np.allclose(closures, vectorized)
+
+
+if __name__ == "__main__":
+    main()
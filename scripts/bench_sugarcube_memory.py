@@ -0,0 +1,120 @@
+"""
+Measures the memory and speed of sugarcube value types.
+
+Builds the same shopping list of ingredients with dict-backed replicas of the
+old Amount/Ingredient/Element classes and with the current slotted, interned
+ones, then reports bytes per ingredient and the time to combine them by
+element.
+
+Usage: python -m scripts.bench_sugarcube_memory [--n 100000]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from src import sugarcube as sc
+
+
+class LegacyElement(object):
+    def __init__(self, name, **properties):
+        self.name = name
+        for prop in properties:
+            setattr(self, prop, properties[prop])
+
+
+class LegacyAmount(object):
+    def __init__(self, value, unit):
+        self.value = value
+        self.unit = unit
+
+
+class LegacyIngredient(object):
+    def __init__(self, amount, element):
+        self.amount = amount
+        self.element = element
+
+
+def build(n, names, amount_cls, ingredient_cls, element_factory, rng):
+    units = [sc.Volume.cup, sc.Volume.tablespoon, sc.Volume.teaspoon]
+    return [
+        ingredient_cls(
+            amount_cls(rng.randint(1, 4), rng.choice(units)),
+            element_factory(rng.choice(names)),
+        )
+        for _ in range(n)
+    ]
+
+
+def measure(name, n, factory):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    ingredients = factory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"{name:>10}: {size / n:6.1f} bytes per ingredient")
+    return ingredients
+
+
+def combine(ingredients, key):
+    out = {}
+    for ingredient in ingredients:
+        k = key(ingredient.element)
+        if k in out:
+            out[k] += ingredient.amount.value
+        else:
+            out[k] = ingredient.amount.value
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=100_000)
+    args = parser.parse_args()
+
+    names = [f"ingredient {i}" for i in range(500)]
+
+    legacy = measure(
+        "legacy",
+        args.n,
+        lambda: build(
+            args.n,
+            names,
+            LegacyAmount,
+            LegacyIngredient,
+            lambda name: LegacyElement(name, density=1.0),
+            random.Random(0),
+        ),
+    )
+    slotted = measure(
+        "slotted",
+        args.n,
+        lambda: build(
+            args.n,
+            names,
+            sc.Amount,
+            sc.Ingredient,
+            lambda name: sc.Element.get(name, density=1.0),
+            random.Random(0),
+        ),
+    )
+
+    # legacy elements are distinct objects per line, so they have to be keyed by
+    # name; slotted ones can be keyed by the element itself or its precomputed key.
+    # Keying by the element is the slowest of the three (its __hash__ and __eq__
+    # are Python methods), so cheffrey.combine_ingredients keys by element.key.
+    for name, ingredients, key in [
+        ("legacy", legacy, lambda element: element.name.lower()),
+        ("slotted", slotted, lambda element: element),
+        ("slotted", slotted, lambda element: element.key),
+    ]:
+        start = time.perf_counter()
+        combined = combine(ingredients, key)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: combined into {len(combined)} in {1000 * elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
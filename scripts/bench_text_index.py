@@ -0,0 +1,66 @@
+"""
+Times building and querying the in-process BM25 text index.
+
+Indexes synthetic recipes built from a small food vocabulary, then reports
+build time, p50/p99 query latency and the cost of re-adding edited recipes.
+
+Usage: python -m scripts.bench_text_index [--recipes 20000] [--queries 500]
+"""
+
+import argparse
+import random
+import time
+
+import scripts._bench_env  # noqa: F401, sets up the app before it is imported
+
+import numpy as np
+
+from app.text_index import TextIndex
+from scripts.bench_semantic_search import WORDS
+
+
+def synthetic_recipe(rng, i):
+    return {
+        "title": f"{' '.join(rng.sample(WORDS, 3))} {i}",
+        "category": rng.choice(WORDS),
+        "ingredients": ",".join(rng.sample(WORDS, 8)),
+        "instructions": " ".join(rng.choices(WORDS, k=80)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    recipes = [synthetic_recipe(rng, i) for i in range(args.recipes)]
+
+    index = TextIndex()
+    start = time.perf_counter()
+    for recipe_id, recipe in enumerate(recipes, 1):
+        index.add(recipe_id, recipe)
+    print(f"built {len(index)} recipes in {time.perf_counter() - start:.2f}s")
+
+    for n_words in (1, 2, 3):
+        timings = []
+        for _ in range(args.queries):
+            query = " ".join(rng.sample(WORDS, n_words))
+            start = time.perf_counter()
+            index.search(query, 100)
+            timings.append(time.perf_counter() - start)
+        ms = 1000 * np.array(timings)
+        print(
+            f"{n_words}-word queries: p50 {np.percentile(ms, 50):.3f} ms  "
+            f"p99 {np.percentile(ms, 99):.3f} ms"
+        )
+
+    start = time.perf_counter()
+    for recipe_id in rng.sample(range(1, args.recipes + 1), 1000):
+        index.add(recipe_id, synthetic_recipe(rng, recipe_id))
+    print(f"re-added 1000 edited recipes in {1000 * (time.perf_counter() - start):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
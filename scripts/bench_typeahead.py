@@ -0,0 +1,53 @@
+"""
+Times title completions from the in-memory typeahead index.
+
+Builds a TitleIndex over synthetic titles and reports build time and p50/p99
+latency for one- to five-letter prefixes, the lengths a user types before
+picking a completion.
+
+Usage: python -m scripts.bench_typeahead [--recipes 100000] [--queries 2000]
+"""
+
+import argparse
+import random
+import time
+
+import scripts._bench_env  # noqa: F401, sets up the app before it is imported
+
+import numpy as np
+
+from app.typeahead import TitleIndex
+from scripts.bench_semantic_search import WORDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    titles = [
+        (i, f"{' '.join(rng.sample(WORDS, rng.randint(2, 5))).title()} {i}")
+        for i in range(args.recipes)
+    ]
+    start = time.perf_counter()
+    index = TitleIndex(titles)
+    print(f"indexed {len(index)} titles in {time.perf_counter() - start:.2f}s")
+
+    for length in range(1, 6):
+        timings = []
+        for _ in range(args.queries):
+            prefix = rng.choice(WORDS)[:length]
+            start = time.perf_counter()
+            index.matches(prefix, 8)
+            timings.append(time.perf_counter() - start)
+        us = 1e6 * np.array(timings)
+        print(
+            f"{length}-letter prefix: p50 {np.percentile(us, 50):6.1f} us  "
+            f"p99 {np.percentile(us, 99):6.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Builds the RecipeIndex used by /api/semantic-search/ from the recipes table.
+
+Needs the embedding store in Config.EMBEDDING_STORE_PATH (see
+src/embedding_store.py) and writes to Config.RECIPE_INDEX_PATH. Workers pick
+up the new index on their next search. Changes logged for the delta tier
+while the build reads the database are kept, the older ones are dropped
+since the new index contains them.
+
+Usage: python -m scripts.build_recipe_index [--trees 100] [--jobs 8]
+"""
+
+import argparse
+import os
+import time
+
+from config import Config
+from app import app
+from app.models import Recipe
+from src.recipe_index import RecipeIndex, DeltaLog, DELTA_FILE, embed_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=None, help="embedding processes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    log = DeltaLog(os.path.join(Config.RECIPE_INDEX_PATH, DELTA_FILE))
+    position = log.position()
+    with app.app_context():
+        recipes = [recipe.to_dict() for recipe in Recipe.query.yield_per(1000)]
+
+    vectors = embed_catalog(Config.EMBEDDING_STORE_PATH, recipes, n_jobs=args.jobs)
+    index = RecipeIndex.build([recipe["id"] for recipe in recipes], vectors, n_trees=args.trees)
+    index.save(Config.RECIPE_INDEX_PATH)
+    log.drop_before(position)
+    print(
+        f"indexed {len(index)} recipes in {time.perf_counter() - start:.1f}s "
+        f"-> {Config.RECIPE_INDEX_PATH}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Records recipe sites once and serves them back locally to crawl offline.
+
+record saves pages (and, with --collection, every recipe a collection page
+links to) under data/scrape_fixtures/<host>/<path>/index.html. serve
+serves that tree over HTTP, each host under /<host>/, so the crawler can be
+pointed at it with host aliases. crawl starts the server in the background
+and runs the ScrapeEngine against the saved pages, printing what it parsed
+and how long it took, without touching the real sites.
+
+Usage: python -m scripts.scrape_fixtures record [URL ...] [--collection URL ...]
+       python -m scripts.scrape_fixtures serve [--port 8765]
+       python -m scripts.scrape_fixtures crawl [--collection URL ...] [--recipe URL ...]
+"""
+
+import argparse
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from src.scrape_engine import ScrapeEngine
+
+FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "scrape_fixtures"
+)
+
+
+def fixture_path(directory, url) -> str:
+    parts = urlsplit(url)
+    return os.path.join(directory, parts.netloc, parts.path.strip("/"), "index.html")
+
+
+def record(engine, directory, urls, collection=False):
+    for url in urls:
+        pages = [url]
+        if collection:
+            pages += engine.collection_urls(url)[1]
+        for page in pages:
+            path = fixture_path(directory, page)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(engine.fetch(page))
+            print(f"saved {page}")
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory, port) -> ThreadingHTTPServer:
+    """serve the fixture tree on 127.0.0.1:port in a background thread"""
+    handler = partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def host_aliases(directory, port) -> dict:
+    """every recorded host -> its base URL on the fixture server"""
+    return {
+        host: f"http://127.0.0.1:{port}/{host}"
+        for host in sorted(os.listdir(directory))
+        if os.path.isdir(os.path.join(directory, host))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["record", "serve", "crawl"])
+    parser.add_argument("urls", nargs="*", help="pages to record")
+    parser.add_argument("--dir", default=FIXTURE_DIR)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--collection", action="append", default=[], help="collection page, recorded with its recipes"
+    )
+    parser.add_argument("--recipe", action="append", default=[], help="recipe page to crawl")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--interval", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        engine = ScrapeEngine()
+        record(engine, args.dir, args.urls)
+        record(engine, args.dir, args.collection, collection=True)
+        return
+
+    server = serve(args.dir, args.port)
+    aliases = host_aliases(args.dir, args.port)
+    if args.command == "serve":
+        for host, base in aliases.items():
+            print(f"--alias {host}={base}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    engine = ScrapeEngine(
+        max_workers=args.workers,
+        per_host=args.per_host,
+        min_interval=args.interval,
+        retries=0,
+        host_aliases=aliases,
+    )
+    start = time.perf_counter()
+    n_recipes = 0
+    for source, _, recipe in engine.crawl(args.collection, {"fixtures": args.recipe}):
+        n_recipes += 1
+        print(f"{source}: {recipe['title']}")
+    print(f"parsed {n_recipes} recipes in {time.perf_counter() - start:.2f}s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,89 @@
-import numpy as np
-import json
-import re
-from dotenv import load_dotenv
-import cheffrey
-from config import ROOT_DIR
-
-load_dotenv()
-
-model = cheffrey.load_embedding_model()
-recipes = cheffrey.load_local_recipes()
-
-
-def remove_non_alphabetic_chars(string):
-    # Use regular expressions to remove non-alphabetic characters
-    cleaned_string = re.sub(r"[^a-zA-Z]", "", string)
-    return cleaned_string
-
-
-def recipe_embedding(recipe):
-    d = {"title": 1, "instructions": 1, "ingredients": 1, "category": 3}
-
-    l = []
-    for type, modifier in d.items():
-        text = recipe[type]
-        if type == "ingredients":
-            text = " ".join(text)
-            text = remove_non_alphabetic_chars(text)
-        embeddings = cheffrey.get_embedding(model, text)
-        if embeddings is not None:
-            l.append(embeddings * modifier)
+"""
+Builds the Annoy index the Streamlit app searches (data/annoy_index.ann) from
+the recipe catalog, numbering recipes by their position ("uid").
 
-    if len(l) == 0:
-        return np.zeros(shape=(model.vector_size))
+Recipes are embedded on a process pool when the memory-mapped embedding store
+exists, and Annoy builds its trees on several threads. The catalog is read in
+chunks of --chunk-size recipes, so only the embeddings are held in memory. Use
+scripts/bench_ann_index.py to pick --trees and the search_k passed to
+cheffrey.search_recipes.
 
-    recipe_embeddings = np.column_stack([l])
-    recipe_embeddings = np.mean(recipe_embeddings, axis=0)
+Usage: python build_annoy_index.py [--trees 1000] [--jobs 8] [--chunk-size 20000] [--no-upload]
+"""
 
-    return recipe_embeddings
-
-
-# Generate embeddings for each recipe
-recipe_embeddings = {}
-
-for title, recipe in recipes.items():
-    recipe_embeddings[title] = recipe_embedding(recipe)
+import argparse
+import time
+from functools import lru_cache
 
+from dotenv import load_dotenv
 from annoy import AnnoyIndex
 
-# Create an AnnoyIndex with the desired embedding dimensions
-embedding_dim = model.vector_size
-annoy_index = AnnoyIndex(embedding_dim, metric="euclidean")
-
-# Add the recipe embeddings to the AnnoyIndex
-# generate sequential ID as you go for use in retrieval
-for i, (title, embedding) in enumerate(recipe_embeddings.items()):
-    annoy_index.add_item(i, embedding)
-    recipes[title]["uid"] = i
-
-with open(ROOT_DIR / "data/recipes.json", "w") as f:
-    json.dump(recipes, f)
-
-# Build the index to enable searching
-annoy_index.build(n_trees=1000)
-path = str(ROOT_DIR / "data/annoy_index.ann")
-annoy_index.save(path)
+import cheffrey
+from embedding_store import EmbeddingStore
+from recipe_index import embed_recipes, embed_catalog
+from recipe_catalog import iter_catalog, iter_chunks, write_catalog
+from config import ROOT_DIR
 
-from dataloader import S3Loader, create_s3
-s3 = S3Loader()
-from boto3 import client
-s3.s3.upload_file(path, s3.bucket, 'annoy_index.ann', ExtraArgs=None, Callback=None, Config=None)
 
+def embed_all(recipes, n_jobs):
+    store_dir = ROOT_DIR / "data/embeddings"
+    if EmbeddingStore.exists(store_dir):
+        return embed_catalog(store_dir, recipes, n_jobs=n_jobs)
+    # gensim vectors can't be shared with worker processes
+    return embed_recipes(gensim_model(), recipes)
+
+
+@lru_cache(maxsize=None)
+def gensim_model():
+    """loaded once, not once per chunk"""
+    return cheffrey.load_embedding_model()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build the recipe Annoy index")
+    parser.add_argument("--trees", type=int, default=1000)
+    parser.add_argument("--jobs", type=int, default=None, help="embedding processes")
+    parser.add_argument(
+        "--build-threads", type=int, default=-1, help="Annoy build threads, -1 for all cores"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=20_000, help="recipes embedded at a time"
+    )
+    parser.add_argument("--no-upload", action="store_true", help="don't upload to S3")
+    args = parser.parse_args()
+
+    # recipes are streamed in chunks, only their embeddings are kept
+    annoy_index = None
+    n_recipes = 0
+    start = time.perf_counter()
+    for chunk in iter_chunks(iter_catalog(), args.chunk_size):
+        recipe_embeddings = embed_all(chunk, args.jobs)
+        if annoy_index is None:
+            # Create an AnnoyIndex with the desired embedding dimensions
+            annoy_index = AnnoyIndex(recipe_embeddings.shape[1], metric="euclidean")
+        # generate sequential ID as you go for use in retrieval
+        for embedding in recipe_embeddings:
+            annoy_index.add_item(n_recipes, embedding)
+            n_recipes += 1
+    print(f"embedded {n_recipes} recipes in {time.perf_counter() - start:.1f}s")
+
+    # the uid of a recipe is its position in the catalog
+    write_catalog(dict(recipe, uid=i) for i, recipe in enumerate(iter_catalog()))
+
+    # Build the index to enable searching
+    start = time.perf_counter()
+    annoy_index.build(n_trees=args.trees, n_jobs=args.build_threads)
+    print(f"built {args.trees} trees in {time.perf_counter() - start:.1f}s")
+    path = str(ROOT_DIR / "data/annoy_index.ann")
+    annoy_index.save(path)
+
+    if not args.no_upload:
+        from dataloader import S3Loader
+
+        s3 = S3Loader()
+        s3.s3.upload_file(path, s3.bucket, 'annoy_index.ann', ExtraArgs=None, Callback=None, Config=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,25 +15,23 @@ import numpy as np
 import gensim
 import json
 from annoy import AnnoyIndex
+from embedding_store import EmbeddingStore, embed_texts
+from recipe_index import RecipeIndex, ExactRecipeIndex, EXACT_SEARCH_MAX
+from recipe_catalog import load_catalog, write_catalog, iter_catalog
 
 logger = logging.getLogger(__name__)
 
 s3 = S3Loader()
+# recipes added from the app, one object each, until compact_s3_recipes
+S3_RECIPE_PREFIX = "recipes/added/"
 
 # openai.api_key = os.getenv("OPENAI_KEY")
 
 
 def get_embedding(model: gensim.models.KeyedVectors, text: str):
-    tokens = text.lower().split()  # Tokenize and preprocess the text
-    embeddings = [
-        model[word] for word in tokens if word in model
-    ]  # Get embeddings for each token
-    num_embeddings = len(embeddings)
-    if num_embeddings > 0:
-        embedding = (
-            np.sum(embeddings, axis=0) / num_embeddings
-        )  # Calculate the average embedding
-        return embedding
+    embeddings, found = embed_texts(model, [text])
+    if found[0]:
+        return embeddings[0]
     else:
         return None
 
@@ -44,12 +42,13 @@ def search_recipes(
     embedding_model: gensim.models.KeyedVectors,
     recipe_id_to_title: dict,
     n=5,
+    search_k=100_000,
 ) -> list:
     query_embedding = get_embedding(embedding_model, query)
     if query_embedding is None:
         return []
     nearest_indices = annoy_index.get_nns_by_vector(
-        query_embedding, n, search_k=100_000
+        query_embedding, n, search_k=search_k
     )
     recommended_recipes = [recipe_id_to_title[i] for i in nearest_indices]
     return recommended_recipes
@@ -87,33 +86,48 @@ def load_annoy_index(embedding_dim):
     print('Loading annoy index')
     new_index = AnnoyIndex(embedding_dim, metric="euclidean")
     new_index.load(str(ROOT_DIR / "data/annoy_index.ann"))
+    n_items = new_index.get_n_items()
+    if n_items <= EXACT_SEARCH_MAX:
+        # small catalogs are faster and exact with a plain matrix product
+        return ExactRecipeIndex.from_index(
+            RecipeIndex(new_index, np.arange(n_items), "euclidean")
+        )
     return new_index
 
 @st.cache_resource()
 def load_embedding_model():
     print('Loading embedding model')
+    # memory-mapped, so this is instant and the pages are shared between processes
+    store_dir = ROOT_DIR / "data/embeddings"
+    if EmbeddingStore.exists(store_dir):
+        return EmbeddingStore.open(store_dir)
+
     # path = ROOT_DIR / "data/twitter_w2vec.txt"
     # glove_model = gensim.models.KeyedVectors.load_word2vec_format(str(path), binary=False)
     path = ROOT_DIR / 'data/lexvec.enwiki+newscrawl.300d.W.pos.vectors'
+    logger.warning(
+        f"No embedding store in {store_dir}, parsing {path.name}. "
+        f"Run `python embedding_store.py {path} {store_dir}` once to speed this up."
+    )
     glove_model = gensim.models.KeyedVectors.load_word2vec_format(path)
     return glove_model
 
 
 def add_to_recipe_file(recipe, overwrite=False):
-    # TODO: inefficient
-    all_recipes = load_local_recipes()
-
-    if (recipe["title"] in all_recipes.keys()) & (overwrite == False):
+    title = recipe.get("Title", recipe.get("title"))
+    if not overwrite and any(r["title"] == title for r in iter_catalog()):
         raise FileExistsError(
-            f"{recipe.title()} already found in the file, and overwrite set to false"
+            f"{title} already found in the file, and overwrite set to false"
         )
 
-    all_recipes[recipe["Title"]] = recipe
-
-    return save_s3_recipes(all_recipes)
+    # one small object per recipe, folded into recipes.yaml by compact_s3_recipes
+    s3.save_recipe(recipe, title, S3_RECIPE_PREFIX)
+    return True
 
 
 class Ingredient(sc.Ingredient):
+    __slots__ = ()
+
     def display(self):
         # amount = self.display_amount()
         # element = self.element
@@ -135,8 +149,9 @@ class Ingredient(sc.Ingredient):
         if self.amount.unit in sc.Mass.units:
             relevant_units = [sc.Mass.units["ounce"], sc.Mass.units["pound"]]
 
+        value, from_unit = self.amount.value, self.amount.unit
         unit_list = [
-            (unit, round(self.to(unit).amount.value, 3))
+            (unit, round(sc.conversions.convert(value, from_unit, unit), 3))
             for unit in relevant_units.values()
             if unit.name not in invalid_unit_names
         ]
@@ -169,7 +184,8 @@ class Ingredient(sc.Ingredient):
 
     def __add__(self, other):
         if isinstance(other, Ingredient):
-            if self.element.name != other.element.name:
+            # same comparison as sc.Element.__eq__: by normalized name
+            if self.element.key != other.element.key:
                 raise TypeError(
                     f"Your trying to add ingredients that are different elements: {self.element.name} and {other.element.name}"
                 )
@@ -279,7 +295,7 @@ def random_ingredient():
 
     unit = sc.Volume.units[choice(list(sc.Volume.units.keys()))]
     amount = sc.Amount(i, unit=unit)
-    sample_elements = [sc.Element(f"ingredient_{i}") for i in range(20)]
+    sample_elements = [sc.Element.get(f"ingredient_{i}") for i in range(20)]
     element = sample(sample_elements, 1)[0]
     return Ingredient(amount, element)
 
@@ -306,10 +322,14 @@ def combine_ingredients(ingredient_list: list):
     out = {}
     for ingredient in ingredient_list:
         if type(ingredient) == Ingredient:
-            if ingredient.element in out.keys():
-                out[ingredient.element] += ingredient
+            # keyed by the precomputed key, hashing the Element itself goes
+            # through a Python-level __hash__ and __eq__ and is slower; the
+            # tuple keeps it apart from the plain strings below
+            key = (Ingredient, ingredient.element.key)
+            if key in out:
+                out[key] += ingredient
             else:
-                out[ingredient.element] = ingredient
+                out[key] = ingredient
         else:
             out[ingredient] = ingredient
 
@@ -416,7 +436,7 @@ def create_ingredient(amount, measure, item):
     if measure is None:
         return str(amount) + " " + str(item)
 
-    element = sc.Element(item)
+    element = sc.Element.get(item)
 
     ing = Ingredient(amount=amount * measure, element=element)
 
@@ -557,13 +577,13 @@ def create_meal_plan_html(meal_plan):
 
 # This should really be in a separate file:
 known_elements = {
-    "flour": sc.Element("Flour", density=0.7),
-    "sugar": sc.Element("Sugar", density=1.2),
-    "salt": sc.Element("Salt", density=1.2),
-    "butter": sc.Element("Butter", density=0.9),
-    "chicken": sc.Element("Chicken"),
-    "salsa": sc.Element("salsa"),
-    "eggs": sc.Element("eggs", is_int=True),
+    "flour": sc.Element.get("Flour", density=0.7),
+    "sugar": sc.Element.get("Sugar", density=1.2),
+    "salt": sc.Element.get("Salt", density=1.2),
+    "butter": sc.Element.get("Butter", density=0.9),
+    "chicken": sc.Element.get("Chicken"),
+    "salsa": sc.Element.get("salsa"),
+    "eggs": sc.Element.get("eggs", is_int=True),
 }
 
 number_dict = {
@@ -592,25 +612,40 @@ number_dict = {
 
 
 def load_local_recipes():
-    with open(ROOT_DIR / "data/recipes.json", "r") as f:
-        x = json.load(f)
-    return x
+    return load_catalog()
 
 
 def save_local_recipes(recipes):
-    with open(ROOT_DIR / "data/recipes.json", "w") as f:
-        json.dump(recipes, f)
+    write_catalog(recipes.values())
     return True
 
 
 def load_s3_recipes() -> dict:
-    return s3.load_yaml("recipes.yaml")
+    recipes = s3.load_yaml("recipes.yaml")
+    added, _ = s3.load_recipes(S3_RECIPE_PREFIX)
+    for recipe in added:
+        recipes[recipe.get("Title", recipe.get("title"))] = recipe
+    return recipes
 
 
 def save_s3_recipes(recipes):
     return s3.save_yaml(recipes, "recipes.yaml")
 
 
+def compact_s3_recipes():
+    """fold the recipes added with add_to_recipe_file into recipes.yaml"""
+    recipes = s3.load_yaml("recipes.yaml")
+    added, keys = s3.load_recipes(S3_RECIPE_PREFIX)
+    if not keys:
+        return False
+    for recipe in added:
+        recipes[recipe.get("Title", recipe.get("title"))] = recipe
+    save_s3_recipes(recipes)
+    # only after recipes.yaml has them, a crash in between just folds them in again
+    s3.delete_objects(keys)
+    return True
+
+
 def load_deleted_recipes():
     with open(ROOT_DIR / "data/to_delete.json", "r") as f:
         x = json.load(f)
@@ -3,6 +3,7 @@ import yaml
 from dotenv import load_dotenv
 from config import *
 import json
+import hashlib
 
 load_dotenv()
 from io import BytesIO, StringIO
@@ -70,6 +71,40 @@ class S3Loader:
         print('saving to delete')
         self.s3.put_object(Body = json.dumps(to_delete), Bucket=self.bucket, Key = 'to_delete.json')
 
+    def save_recipe(self, recipe, title, prefix):
+        """
+        One recipe as its own small JSON object under prefix, instead of rewriting a whole file.
+
+        Parameters:
+        - title (str): The recipe's title, which names the object. Passed in
+          because recipes from the Streamlit app keep it under "Title".
+        """
+        key = prefix + hashlib.sha1(title.encode("utf-8")).hexdigest() + ".json"
+        self.s3.put_object(Body=json.dumps(recipe), Bucket=self.bucket, Key=key)
+        return key
+
+    def load_recipes(self, prefix):
+        """
+        The recipes saved with save_recipe under prefix.
+
+        Returns:
+        - (list of dict, list of str): The recipes, oldest first, and their keys.
+        """
+        objects = sorted(self.get_all_objects(Bucket=self.bucket, Prefix=prefix), key=lambda o: o["LastModified"])
+        recipes = [
+            json.loads(self.s3.get_object(Bucket=self.bucket, Key=o["Key"])["Body"].read())
+            for o in objects
+        ]
+        return recipes, [o["Key"] for o in objects]
+
+    def delete_objects(self, keys):
+        for start in range(0, len(keys), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[start : start + 1000]]},
+            )
+        return True
+
     def save_yaml(self, obj, path):
         buffer = StringIO()
         yaml.safe_dump(obj, buffer)
@@ -0,0 +1,185 @@
+"""
+Persistent dedup index of scraped recipe URLs and titles.
+
+The scraper used to check every URL and title against Python lists of the
+whole catalog, O(n) per check. A DedupStore keeps canonical URLs and title
+fingerprints in a small SQLite file (data/dedup.sqlite), loads them into
+sets once per crawl, and writes every scraped recipe to both in one
+transaction, so checks are O(1) and survive across crawls.
+
+URLs are canonicalized before they are compared, so http/https, "www.",
+trailing slashes, fragments and tracking parameters don't make a recipe
+look new. Titles are compared by fingerprint: lowercased words without
+punctuation, stop words or plural endings, sorted. "Chicken-Noodle Soups"
+and "chicken noodle soup" are the same recipe title.
+
+The store is seeded from the catalog (and data/url_log.csv) when the file
+is first created. Rebuild it with:
+    python dedup_store.py --rebuild
+"""
+
+import argparse
+import csv
+import logging
+import os
+import re
+import sqlite3
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+STORE_PATH = os.path.join(DATA_DIR, "dedup.sqlite")
+URL_LOG_PATH = os.path.join(DATA_DIR, "url_log.csv")
+
+TRACKING_PARAMETERS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "smid", "smtyp"}
+STOP_WORDS = {"a", "an", "and", "the", "of", "with", "in", "on", "for", "recipe"}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def canonical_url(url: str) -> str:
+    """https, no www., no fragment, tracking parameters or trailing slash, sorted query"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[len("www.") :]
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.startswith("utm_") and key not in TRACKING_PARAMETERS
+        )
+    )
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def title_fingerprint(title: str) -> str:
+    words = set()
+    for word in _WORD.findall(title.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return " ".join(sorted(words))
+
+
+class DedupStore(object):
+    """
+    Parameters:
+    - connection (sqlite3.Connection): The open store.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._lock = threading.Lock()
+        self.urls = {url for (url,) in connection.execute("SELECT url FROM urls")}
+        self.titles = {}  # title -> fingerprint
+        self.fingerprints = {}  # fingerprint -> first title with it
+        for title, fingerprint in connection.execute(
+            "SELECT title, fingerprint FROM titles ORDER BY rowid"
+        ):
+            self.titles[title] = fingerprint
+            self.fingerprints.setdefault(fingerprint, title)
+
+    @classmethod
+    def open(cls, path=STORE_PATH, recipes=None):
+        """
+        Open the store at path, creating it if needed.
+
+        Parameters:
+        - recipes (callable): Returns the catalog recipes to seed a new store
+          with, recipe_catalog.iter_catalog by default.
+        """
+        is_new = not os.path.exists(path)
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS titles (title TEXT PRIMARY KEY, fingerprint TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS titles_fingerprint ON titles (fingerprint);
+            """
+        )
+        store = cls(connection)
+        if is_new:
+            try:
+                store.seed(recipes)
+            except BaseException:
+                # seed again next time rather than keep an empty store
+                connection.close()
+                os.remove(path)
+                raise
+        return store
+
+    def seed(self, recipes=None):
+        """add every recipe of the catalog and every URL of url_log.csv"""
+        if recipes is None:
+            from recipe_catalog import iter_catalog
+
+            recipes = iter_catalog
+        n_recipes = 0
+        with self._lock, self.connection:
+            for recipe in recipes():
+                self._add(recipe.get("canonical_url"), recipe["title"])
+                n_recipes += 1
+            if os.path.exists(URL_LOG_PATH):
+                with open(URL_LOG_PATH, newline="") as f:
+                    for row in csv.reader(f):
+                        if row and row[0].startswith("http"):
+                            self._add(row[0], None)
+        logger.info(f"Seeded the dedup store with {n_recipes} recipes")
+
+    def has_url(self, url) -> bool:
+        return bool(url) and canonical_url(url) in self.urls
+
+    def similar_title(self, title):
+        """the stored title with the same fingerprint as title, or None"""
+        if title in self.titles:
+            return title
+        return self.fingerprints.get(title_fingerprint(title))
+
+    def unique_title(self, title, source) -> str:
+        """title, or title with the source (and a number) if a similar one is stored"""
+        if self.similar_title(title) is None:
+            return title
+        candidate, n = f"{title} ({source})", 2
+        while candidate in self.titles:
+            candidate, n = f"{title} ({source} {n})", n + 1
+        return candidate
+
+    def _add(self, url, title):
+        if url and canonical_url(url) not in self.urls:
+            self.urls.add(canonical_url(url))
+            self.connection.execute("INSERT OR IGNORE INTO urls VALUES (?)", (canonical_url(url),))
+        if title and title not in self.titles:
+            fingerprint = title_fingerprint(title)
+            self.titles[title] = fingerprint
+            self.fingerprints.setdefault(fingerprint, title)
+            self.connection.execute("INSERT OR IGNORE INTO titles VALUES (?, ?)", (title, fingerprint))
+
+    def add(self, title, *urls):
+        """record a scraped recipe under its title and every URL it was found at, in one transaction"""
+        with self._lock, self.connection:
+            for url in urls:
+                self._add(url, None)
+            self._add(None, title)
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the scraper's URL and title dedup store")
+    parser.add_argument("--path", default=STORE_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="drop the store and seed it again")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.path):
+        os.remove(args.path)
+    store = DedupStore.open(args.path)
+    print(f"{len(store.urls)} urls, {len(store.titles)} titles")
+    store.close()
@@ -0,0 +1,226 @@
+"""
+Memory-mapped word embeddings.
+
+Parsing the 300d lexvec text file with gensim takes a long time on every
+start and every process ends up with its own copy of the float matrix. This
+module converts the text file once into three .npy files:
+
+    words.npy    sorted vocabulary, fixed-width utf-8 bytes
+    rows.npy     row of each sorted word in the matrix
+    vectors.npy  the (vocab, dim) matrix as float16 or float32
+
+EmbeddingStore.open memory-maps them, so opening takes milliseconds and all
+processes share the same pages through the OS cache. The store supports the
+parts of gensim's KeyedVectors API that cheffrey uses (`word in model`,
+`model[word]`, `model.vector_size`).
+
+Convert with:
+    python embedding_store.py data/lexvec.enwiki+newscrawl.300d.W.pos.vectors data/embeddings
+"""
+
+import argparse
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORDS_FILE = "words.npy"
+ROWS_FILE = "rows.npy"
+VECTORS_FILE = "vectors.npy"
+
+# longer tokens are URLs and junk, and would widen every vocabulary entry
+MAX_WORD_BYTES = 48
+
+
+class EmbeddingStore(object):
+    def __init__(self, words, rows, vectors):
+        self.words = words
+        self.rows = rows
+        self.vectors = vectors
+
+    @classmethod
+    def open(cls, directory, mmap_mode="r"):
+        directory = str(directory)
+        return cls(
+            np.load(os.path.join(directory, WORDS_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, ROWS_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, VECTORS_FILE), mmap_mode=mmap_mode),
+        )
+
+    @staticmethod
+    def exists(directory):
+        return all(
+            os.path.exists(os.path.join(str(directory), name))
+            for name in (WORDS_FILE, ROWS_FILE, VECTORS_FILE)
+        )
+
+    @property
+    def vector_size(self):
+        return self.vectors.shape[1]
+
+    def __len__(self):
+        return len(self.words)
+
+    def index_of(self, tokens):
+        """
+        Matrix rows of many tokens at once, -1 for tokens not in the vocabulary.
+
+        Parameters:
+        - tokens (list of str): The tokens to look up.
+
+        Returns:
+        - np.ndarray: int64 row index per token.
+        """
+        if len(tokens) == 0:
+            return np.empty(0, dtype=np.int64)
+        keys = np.array(
+            [token.encode("utf-8") for token in tokens], dtype=self.words.dtype
+        )
+        positions = np.searchsorted(self.words, keys)
+        positions = np.minimum(positions, len(self.words) - 1)
+        found = self.words[positions] == keys
+        # tokens longer than the vocabulary width were truncated by the cast above
+        found &= np.array([len(token.encode("utf-8")) for token in tokens]) <= self.words.dtype.itemsize
+        return np.where(found, self.rows[positions], -1).astype(np.int64)
+
+    def __contains__(self, word):
+        return self.index_of([word])[0] >= 0
+
+    def __getitem__(self, word):
+        row = self.index_of([word])[0]
+        if row < 0:
+            raise KeyError(word)
+        return np.asarray(self.vectors[row], dtype=np.float32)
+
+
+def vocab_rows(model, tokens):
+    """matrix rows of tokens, -1 when missing; works for EmbeddingStore and gensim KeyedVectors"""
+    if hasattr(model, "index_of"):
+        return model.index_of(tokens)
+    key_to_index = model.key_to_index
+    return np.fromiter(
+        (key_to_index.get(token, -1) for token in tokens), dtype=np.int64, count=len(tokens)
+    )
+
+
+def embed_texts(model, texts, batch_size=512):
+    """
+    Mean token embedding of many texts at once.
+
+    Texts are lowercased and split on whitespace. Every distinct token is
+    looked up once for the whole call, and each batch of texts is reduced to
+    (text, row, count) triples, so a row is gathered from the matrix once per
+    text no matter how often the token repeats, and summed with one reduceat.
+
+    Parameters:
+    - model: An EmbeddingStore or gensim KeyedVectors.
+    - texts (list of str): The texts to embed.
+    - batch_size (int): Texts per gather, bounds the temporary memory.
+
+    Returns:
+    - (np.ndarray, np.ndarray): float32 (len(texts), dim) means, and a bool mask
+      of the texts that had at least one known token. Rows for the others are zero.
+    """
+    dim = model.vector_size
+    n_rows = len(model.vectors)
+    embeddings = np.zeros((len(texts), dim), dtype=np.float32)
+    found = np.zeros(len(texts), dtype=bool)
+
+    token_ids = {}
+    texts_tokens = []
+    for text in texts:
+        texts_tokens.append(
+            [token_ids.setdefault(token, len(token_ids)) for token in text.lower().split()]
+        )
+    rows_of_token = vocab_rows(model, list(token_ids))
+
+    for start in range(0, len(texts), batch_size):
+        batch = texts_tokens[start:start + batch_size]
+        lengths = np.fromiter((len(tokens) for tokens in batch), dtype=np.int64, count=len(batch))
+        if lengths.sum() == 0:
+            continue
+        text_of_token = np.repeat(np.arange(len(batch), dtype=np.int64), lengths)
+        rows = rows_of_token[np.fromiter(
+            (token for tokens in batch for token in tokens), dtype=np.int64, count=lengths.sum()
+        )]
+        known = rows >= 0
+        if not known.any():
+            continue
+
+        # sparse (text, row) -> count, sorted by text
+        pairs, counts = np.unique(text_of_token[known] * n_rows + rows[known], return_counts=True)
+        pair_texts, pair_rows = np.divmod(pairs, n_rows)
+        starts = np.flatnonzero(np.r_[True, pair_texts[1:] != pair_texts[:-1]])
+
+        gathered = np.asarray(model.vectors[pair_rows], dtype=np.float32)
+        gathered *= counts[:, None]
+        sums = np.add.reduceat(gathered, starts, axis=0)
+        totals = np.add.reduceat(counts, starts)
+
+        texts_in_batch = start + pair_texts[starts]
+        embeddings[texts_in_batch] = sums / totals[:, None]
+        found[texts_in_batch] = True
+
+    return embeddings, found
+
+
+def convert_word2vec(text_path, directory, dtype=np.float16):
+    """
+    Convert a word2vec text file ("<n> <dim>" header, then "<word> <floats>") into a store.
+
+    Parameters:
+    - text_path (str): The word2vec text file.
+    - directory (str): Where to write the .npy files.
+    - dtype: float16 halves the size on disk and in the page cache, float32 keeps full precision.
+    """
+    directory = str(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(text_path, "r", encoding="utf-8", errors="replace") as f:
+        n_words, dim = (int(x) for x in f.readline().split())
+        vectors = np.lib.format.open_memmap(
+            os.path.join(directory, VECTORS_FILE + ".tmp"),
+            mode="w+",
+            dtype=dtype,
+            shape=(n_words, dim),
+        )
+        words = []
+        seen = set()
+        for line in f:
+            parts = line.rstrip().split(" ")
+            word = parts[0]
+            encoded = word.encode("utf-8")
+            if len(parts) != dim + 1 or len(encoded) > MAX_WORD_BYTES or encoded in seen:
+                continue
+            seen.add(encoded)
+            vectors[len(words)] = np.asarray(parts[1:], dtype=np.float32)
+            words.append(encoded)
+
+    n_kept = len(words)
+    logger.info(f"kept {n_kept} of {n_words} words")
+
+    order = np.argsort(np.array(words, dtype=object)).astype(np.int32)
+    sorted_words = np.array(words, dtype=f"S{MAX_WORD_BYTES}")[order]
+    np.save(os.path.join(directory, WORDS_FILE), sorted_words)
+    np.save(os.path.join(directory, ROWS_FILE), order)
+
+    # drop the rows we skipped
+    np.save(os.path.join(directory, VECTORS_FILE), vectors[:n_kept])
+    del vectors
+    os.remove(os.path.join(directory, VECTORS_FILE + ".tmp"))
+    return EmbeddingStore.open(directory)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Convert word2vec text vectors into a memory-mapped EmbeddingStore"
+    )
+    parser.add_argument("text_path")
+    parser.add_argument("directory")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    args = parser.parse_args()
+
+    convert_word2vec(args.text_path, args.directory, dtype=np.dtype(args.dtype))
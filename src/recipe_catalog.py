@@ -0,0 +1,321 @@
+"""
+Streaming access to the recipe catalog.
+
+The catalog used to be one JSON object of title -> recipe (data/recipes.json),
+read whole with json.load by every tool, so peak memory grew with the
+catalog. It is now stored as JSON Lines (data/recipes.jsonl), one recipe per
+line in catalog order, and read with iter_catalog, which holds one recipe at
+a time.
+
+iter_catalog also reads the old format incrementally, one title/recipe pair
+at a time, so tools keep working on a catalog that hasn't been converted yet.
+
+New and edited recipes are appended to a log next to the snapshot
+(data/recipes.jsonl.log), so adding a recipe is one small write instead of a
+rewrite of the whole catalog. iter_catalog applies the log on top of the
+snapshot: an edited recipe keeps its position and new recipes come last.
+Once the log grows past COMPACT_LOG_BYTES, it is folded into a new snapshot
+that atomically replaces the old one.
+
+Convert once with:
+    python recipe_catalog.py data/recipes.json data/recipes.jsonl
+and compact by hand with:
+    python recipe_catalog.py --compact
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import os
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+CATALOG_FILE = "recipes.jsonl"
+LEGACY_CATALOG_FILE = "recipes.json"
+LOG_SUFFIX = ".log"
+# appended bytes that trigger a compaction, a few thousand recipes
+COMPACT_LOG_BYTES = 8 << 20
+
+_READ_SIZE = 1 << 16
+_decoder = json.JSONDecoder()
+
+
+def catalog_path(data_dir=DATA_DIR) -> str:
+    """the JSON Lines catalog in data_dir, or the old recipes.json if it hasn't been converted"""
+    path = os.path.join(data_dir, CATALOG_FILE)
+    legacy_path = os.path.join(data_dir, LEGACY_CATALOG_FILE)
+    if not os.path.exists(path) and os.path.exists(legacy_path):
+        return legacy_path
+    return path
+
+
+def _iter_json_object(f):
+    """
+    (key, value) pairs of the top-level JSON object in f, parsed one value at a time.
+
+    Only the value being parsed and one read buffer are held in memory.
+    """
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = f.read(_READ_SIZE)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    def expect(characters):
+        nonlocal position
+        skip_whitespace()
+        if position >= len(buffer) or buffer[position] not in characters:
+            found = buffer[position : position + 20] if position < len(buffer) else "end of file"
+            raise ValueError(f"Expected {characters!r} in catalog, found {found!r}")
+        position += 1
+        return buffer[position - 1]
+
+    def value():
+        nonlocal position
+        skip_whitespace()
+        while True:
+            try:
+                parsed, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # a number or literal at the end of the buffer may continue in the next read
+            if end == len(buffer) and not eof:
+                fill()
+                continue
+            position = end
+            return parsed
+
+    fill()
+    expect("{")
+    skip_whitespace()
+    if position < len(buffer) and buffer[position] == "}":
+        return
+    while True:
+        key = value()
+        expect(":")
+        yield key, value()
+        if expect(",}") == "}":
+            return
+
+
+def _iter_jsonl(path):
+    try:
+        f = open(path, "r")
+    except FileNotFoundError:
+        return
+    with f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # a torn last line from an interrupted append, anything else is corruption
+                if f.readline():
+                    raise
+                logger.warning(f"Ignoring incomplete last line {line_number} of {path}")
+
+
+def iter_catalog(path=None):
+    """
+    Recipes of the catalog in order, one at a time.
+
+    Parameters:
+    - path (str): A .jsonl catalog, whose log is applied, or an old
+      title -> recipe .json file. catalog_path() by default.
+
+    Yields:
+    - dict: One recipe.
+    """
+    path = str(path or catalog_path())
+    if not path.endswith(".jsonl"):
+        with open(path, "r") as f:
+            for _, recipe in _iter_json_object(f):
+                yield recipe
+        return
+
+    # the log first: a compaction in between only moves its entries into the snapshot
+    pending = {recipe["title"]: recipe for recipe in _iter_jsonl(path + LOG_SUFFIX)}
+    for recipe in _iter_jsonl(path):
+        yield pending.pop(recipe["title"], recipe)
+    yield from pending.values()
+
+
+def iter_chunks(recipes, size):
+    """lists of up to size recipes from the iterable"""
+    recipes = iter(recipes)
+    while chunk := list(islice(recipes, size)):
+        yield chunk
+
+
+def load_catalog(path=None) -> dict:
+    """the whole catalog as title -> recipe, for the tools that really need all of it"""
+    return {recipe["title"]: recipe for recipe in iter_catalog(path)}
+
+
+def _locked(path):
+    lock = open(path + ".lock", "a")
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+
+def _log_position(log_path):
+    """(inode, size) of the log, or None if there is none"""
+    try:
+        stat = os.stat(log_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size
+
+
+def _drop_log_before(path, position):
+    """remove the log entries up to position, keeping the ones appended since"""
+    if position is None:
+        return
+    log_path = path + LOG_SUFFIX
+    with _locked(path):
+        if _log_position(log_path) is None or _log_position(log_path)[0] != position[0]:
+            return  # another compaction got there first
+        with open(log_path, "rb") as f:
+            f.seek(position[1])
+            rest = f.read()
+        if not rest:
+            os.remove(log_path)
+            return
+        tmp_path = f"{log_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(rest)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, log_path)
+
+
+def write_catalog(recipes, path=None) -> int:
+    """
+    Write recipes as a new JSON Lines snapshot of the catalog.
+
+    Recipes are streamed to a temporary file next to path, which then
+    atomically replaces it, so readers (including the iterator that may be
+    producing recipes) never see a half-written catalog. The log entries
+    that were there when writing started are then dropped, as recipes is
+    expected to come from iter_catalog, which applied them. Later appends
+    are kept. recipes loaded before the write started (with load_catalog,
+    say) would lose what was appended in between: tools that change a few
+    recipes over a long run should append_recipe them instead.
+
+    Parameters:
+    - recipes (iterable of dict): The recipes, in catalog order.
+    - path (str): Where to write, os.path.join(DATA_DIR, CATALOG_FILE) by default.
+
+    Returns:
+    - int: The number of recipes written.
+    """
+    path = str(path or os.path.join(DATA_DIR, CATALOG_FILE))
+    # taken under the append lock and before recipes is read, so anything
+    # appended after it is kept, even if the iterator picked it up as well
+    with _locked(path):
+        position = _log_position(path + LOG_SUFFIX)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    n_recipes = 0
+    try:
+        with open(tmp_path, "w") as f:
+            for recipe in recipes:
+                f.write(json.dumps(recipe) + "\n")
+                n_recipes += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _drop_log_before(path, position)
+    return n_recipes
+
+
+def compact_catalog(path=None) -> int:
+    """fold the log into a new snapshot, returns the number of recipes in it"""
+    path = str(path or os.path.join(DATA_DIR, CATALOG_FILE))
+    return write_catalog(iter_catalog(path), path)
+
+
+def append_recipe(recipe, path=None, compact_after=COMPACT_LOG_BYTES) -> int:
+    """
+    Add or replace (by title) one recipe in the catalog with a single append.
+
+    Parameters:
+    - recipe (dict): The recipe.
+    - path (str): The .jsonl catalog, os.path.join(DATA_DIR, CATALOG_FILE) by default.
+    - compact_after (int): Compact the catalog once its log is this many bytes.
+
+    Returns:
+    - int: The size of the log after the append, 0 if it was compacted.
+    """
+    path = str(path or os.path.join(DATA_DIR, CATALOG_FILE))
+    legacy_path = os.path.join(os.path.dirname(path), LEGACY_CATALOG_FILE)
+    if not os.path.exists(path) and os.path.exists(legacy_path):
+        convert_catalog(legacy_path, path)
+
+    with _locked(path):
+        with open(path + LOG_SUFFIX, "a") as f:
+            f.write(json.dumps(recipe) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+
+    if size < compact_after:
+        return size
+    compact_catalog(path)
+    return 0
+
+
+def convert_catalog(json_path, jsonl_path) -> int:
+    """
+    Convert an old title -> recipe recipes.json into a JSON Lines catalog.
+
+    Returns:
+    - int: The number of recipes converted.
+    """
+    n_recipes = write_catalog(iter_catalog(json_path), jsonl_path)
+    logger.info(f"Converted {n_recipes} recipes from {json_path} to {jsonl_path}")
+    return n_recipes
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Convert the recipes.json catalog into JSON Lines"
+    )
+    parser.add_argument("json_path", nargs="?", default=os.path.join(DATA_DIR, LEGACY_CATALOG_FILE))
+    parser.add_argument("jsonl_path", nargs="?", default=os.path.join(DATA_DIR, CATALOG_FILE))
+    parser.add_argument(
+        "--compact", action="store_true", help="fold the log of jsonl_path into its snapshot instead"
+    )
+    args = parser.parse_args()
+
+    if args.compact:
+        logger.info(f"Compacted {compact_catalog(args.jsonl_path)} recipes")
+    else:
+        convert_catalog(args.json_path, args.jsonl_path)
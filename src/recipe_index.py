@@ -0,0 +1,555 @@
+"""
+Approximate nearest-neighbour index over recipe embeddings, keyed by Recipe.id.
+
+The Annoy index built by build_annoy_index.py numbers recipes by their
+position in recipes.json (the "uid"), which means nothing to the database.
+RecipeIndex keeps the Annoy items next to an array of the Recipe.id of every
+item, so search results can be handed straight to the database.
+
+A saved index is a directory with:
+
+    recipes.ann      the Annoy index, memory-mapped on load
+    recipe_ids.npy   Recipe.id of every Annoy item
+    meta.json        dimension and metric
+    delta.jsonl      changes since the index was built (see TieredRecipeIndex)
+
+Small catalogs are searched exactly instead: ExactRecipeIndex keeps the
+vectors in one contiguous float32 matrix and answers a query with a single
+matrix-vector product, which below EXACT_SEARCH_MAX recipes is both faster
+and more accurate than Annoy (see scripts/bench_exact_search.py).
+load_search_index picks the backend from the catalog size.
+
+Annoy indexes can't be changed once built, so TieredRecipeIndex serves the
+saved index as a base tier and keeps recipes added, edited or deleted since
+then in a small delta tier that is searched by brute force. Every process
+replays the same delta log, and compact() folds the delta into a new base.
+"""
+
+import base64
+import fcntl
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from annoy import AnnoyIndex
+
+try:
+    from embedding_store import EmbeddingStore, embed_texts
+except ImportError:  # imported as src.recipe_index by the Flask app
+    from src.embedding_store import EmbeddingStore, embed_texts
+
+INDEX_FILE = "recipes.ann"
+IDS_FILE = "recipe_ids.npy"
+META_FILE = "meta.json"
+DELTA_FILE = "delta.jsonl"
+
+# catalogs up to this size are searched exactly. scripts/bench_exact_search.py
+# (300 dims, k=10, 100 trees, search_k 100000) p50 per query, exact vs annoy:
+# 20k 2.0 vs 10.8 ms, 50k 7.1 vs 8.5 ms, 60k 9.9 vs 10.2 ms, 70k 10.3 vs 9.6 ms,
+# 100k 12.6 vs 6.8 ms. Annoy only wins from about 70k.
+EXACT_SEARCH_MAX = 60_000
+
+# weight of each field in the recipe embedding
+FIELD_WEIGHTS = {"title": 1, "instructions": 1, "ingredients": 1, "category": 3}
+
+
+def remove_non_alphabetic_chars(string):
+    # Use regular expressions to remove non-alphabetic characters
+    cleaned_string = re.sub(r"[^a-zA-Z]", "", string)
+    return cleaned_string
+
+
+def field_text(recipe, field):
+    text = recipe.get(field) or ""
+    if field == "ingredients":
+        text = " ".join(text)
+        text = remove_non_alphabetic_chars(text)
+    elif not isinstance(text, str):
+        # instructions are a list of steps in Recipe.to_dict
+        text = " ".join(text)
+    return text
+
+
+def embed_recipes(model, recipes):
+    """
+    Embeddings of many recipe dicts, one batched embed_texts call per field.
+
+    Each recipe gets the mean of its weighted field embeddings, over the fields
+    that had at least one known token, and zeros when none did.
+
+    Returns:
+    - np.ndarray: float32 (len(recipes), model.vector_size)
+    """
+    total = np.zeros((len(recipes), model.vector_size), dtype=np.float32)
+    n_fields = np.zeros(len(recipes), dtype=np.float32)
+    for field, weight in FIELD_WEIGHTS.items():
+        texts = [field_text(recipe, field) for recipe in recipes]
+        embeddings, found = embed_texts(model, texts)
+        total[found] += embeddings[found] * weight
+        n_fields += found
+    return total / np.maximum(n_fields, 1)[:, None]
+
+
+_worker_store = None
+
+
+def _open_worker_store(store_dir):
+    global _worker_store
+    _worker_store = EmbeddingStore.open(store_dir)
+
+
+def _embed_chunk(recipes):
+    return embed_recipes(_worker_store, recipes)
+
+
+def embed_catalog(store_dir, recipes, n_jobs=None, chunk_size=2000):
+    """
+    embed_recipes over a whole catalog with a process pool.
+
+    Every worker memory-maps the same EmbeddingStore, so the pool costs no
+    extra copies of the vectors, and gets the recipes in chunks.
+
+    Parameters:
+    - store_dir (str): Directory of the EmbeddingStore.
+    - recipes (list of dict): The recipes to embed.
+    - n_jobs (int): Worker processes, os.cpu_count() by default.
+    - chunk_size (int): Recipes per task.
+    """
+    n_jobs = n_jobs or os.cpu_count()
+    if n_jobs == 1 or len(recipes) <= chunk_size:
+        return embed_recipes(EmbeddingStore.open(store_dir), recipes)
+
+    chunks = [recipes[i:i + chunk_size] for i in range(0, len(recipes), chunk_size)]
+    with ProcessPoolExecutor(
+        n_jobs, initializer=_open_worker_store, initargs=(str(store_dir),)
+    ) as pool:
+        return np.concatenate(list(pool.map(_embed_chunk, chunks)))
+
+
+class RecipeIndex(object):
+    def __init__(self, annoy_index, recipe_ids, metric):
+        self.annoy_index = annoy_index
+        self.recipe_ids = recipe_ids
+        self.metric = metric
+
+    @classmethod
+    def build(cls, recipe_ids, vectors, metric="euclidean", n_trees=100, n_jobs=-1):
+        """
+        Parameters:
+        - recipe_ids (list of int): Recipe.id of every row of vectors.
+        - vectors (np.ndarray): (n, dim) recipe embeddings.
+        - n_trees (int): More trees, better recall, bigger index.
+        - n_jobs (int): Threads Annoy builds trees on, -1 for all cores.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        annoy_index = AnnoyIndex(vectors.shape[1], metric=metric)
+        for item, vector in enumerate(vectors):
+            annoy_index.add_item(item, vector)
+        annoy_index.build(n_trees, n_jobs=n_jobs)
+        return cls(annoy_index, np.asarray(recipe_ids, dtype=np.int64), metric)
+
+    @property
+    def dimension(self):
+        return self.annoy_index.f
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def save(self, directory):
+        directory = str(directory)
+        os.makedirs(directory, exist_ok=True)
+        # write next to the old files and swap them in, so a worker that opens
+        # the index mid-save still finds a complete set
+        self.annoy_index.save(os.path.join(directory, INDEX_FILE + ".tmp"))
+        with open(os.path.join(directory, IDS_FILE + ".tmp"), "wb") as f:
+            np.save(f, self.recipe_ids)
+        with open(os.path.join(directory, META_FILE + ".tmp"), "w") as f:
+            json.dump({"dimension": self.dimension, "metric": self.metric}, f)
+        for name in (INDEX_FILE, IDS_FILE, META_FILE):
+            os.replace(os.path.join(directory, name + ".tmp"), os.path.join(directory, name))
+
+    @classmethod
+    def load(cls, directory):
+        directory = str(directory)
+        with open(os.path.join(directory, META_FILE), "r") as f:
+            meta = json.load(f)
+        annoy_index = AnnoyIndex(meta["dimension"], metric=meta["metric"])
+        annoy_index.load(os.path.join(directory, INDEX_FILE))  # mmap
+        recipe_ids = np.load(os.path.join(directory, IDS_FILE))
+        return cls(annoy_index, recipe_ids, meta["metric"])
+
+    @staticmethod
+    def exists(directory):
+        return all(
+            os.path.exists(os.path.join(str(directory), name))
+            for name in (INDEX_FILE, IDS_FILE, META_FILE)
+        )
+
+    def items(self):
+        """(Recipe.id, vector) of every item"""
+        for item, recipe_id in enumerate(self.recipe_ids.tolist()):
+            yield recipe_id, self.annoy_index.get_item_vector(item)
+
+    def search(self, vector, n=10, search_k=-1):
+        """
+        The n recipes nearest to vector.
+
+        Returns:
+        - list of (int, float): (Recipe.id, distance), nearest first.
+        """
+        items, distances = self.annoy_index.get_nns_by_vector(
+            vector, n, search_k=search_k, include_distances=True
+        )
+        return [
+            (int(self.recipe_ids[item]), distance)
+            for item, distance in zip(items, distances)
+        ]
+
+
+def _distances(metric, vectors, query):
+    """Annoy's distance between query and every row of vectors"""
+    if metric == "angular":
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        cosine = vectors @ query / np.maximum(norms, 1e-12)
+        return np.sqrt(np.maximum(2 - 2 * cosine, 0))
+    if metric == "manhattan":
+        return np.abs(vectors - query).sum(axis=1)
+    if metric == "euclidean":
+        return np.sqrt(((vectors - query) ** 2).sum(axis=1))
+    raise ValueError(f"Unsupported metric: {metric}")
+
+
+class ExactRecipeIndex(object):
+    """
+    Brute-force search over a contiguous float32 matrix.
+
+    For the angular metric the rows are normalized up front, so ranking is a
+    dot product. For euclidean the squared row norms are kept, and
+    |x - q|^2 = |x|^2 - 2 x.q + |q|^2 is again one matrix-vector product.
+    Distances come back in the same units as Annoy's.
+
+    Parameters:
+    - recipe_ids (list of int): Recipe.id of every row of vectors.
+    - vectors (np.ndarray): (n, dim) recipe embeddings.
+    - metric (str): "euclidean" or "angular".
+    """
+
+    def __init__(self, recipe_ids, vectors, metric="euclidean"):
+        if metric not in ("euclidean", "angular"):
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.metric = metric
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if metric == "angular":
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)[:, None]
+        self.vectors = vectors
+        self._squared_norms = (vectors ** 2).sum(axis=1)
+
+    @classmethod
+    def from_index(cls, index):
+        """the exact counterpart of a RecipeIndex"""
+        n_items = len(index)
+        vectors = np.empty((n_items, index.dimension), dtype=np.float32)
+        for item in range(n_items):
+            vectors[item] = index.annoy_index.get_item_vector(item)
+        return cls(index.recipe_ids, vectors, index.metric)
+
+    @property
+    def dimension(self):
+        return self.vectors.shape[1]
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def items(self):
+        return zip(self.recipe_ids.tolist(), self.vectors)
+
+    def _nearest(self, queries, n):
+        """(rows, distances) of the n nearest rows for every query, nearest first"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n = min(n, len(self.vectors))
+        if n == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty
+
+        if self.metric == "angular":
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1), 1e-12)[:, None]
+            # smaller is nearer: 2 - 2 cos is the squared angular distance
+            scores = 2 - 2 * (queries @ self.vectors.T)
+        else:
+            scores = (
+                self._squared_norms[None, :]
+                - 2 * (queries @ self.vectors.T)
+                + (queries ** 2).sum(axis=1)[:, None]
+            )
+
+        if n < len(self.vectors):
+            rows = np.argpartition(scores, n - 1, axis=1)[:, :n]
+        else:
+            rows = np.broadcast_to(np.arange(n), (len(queries), n))
+        row_scores = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(row_scores, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        distances = np.sqrt(np.maximum(np.take_along_axis(row_scores, order, axis=1), 0))
+        return rows, distances
+
+    def search(self, vector, n=10, search_k=-1):
+        """
+        The n recipes nearest to vector. search_k is ignored, every row is checked.
+
+        Returns:
+        - list of (int, float): (Recipe.id, distance), nearest first.
+        """
+        return self.search_many([vector], n)[0]
+
+    def search_many(self, vectors, n=10):
+        """search for a batch of query vectors with one matrix product"""
+        rows, distances = self._nearest(vectors, n)
+        return [
+            list(zip(self.recipe_ids[query_rows].tolist(), query_distances.tolist()))
+            for query_rows, query_distances in zip(rows, distances)
+        ]
+
+    def get_nns_by_vector(self, vector, n, search_k=-1, include_distances=False):
+        """AnnoyIndex-compatible lookup by row number, for the Streamlit app"""
+        rows, distances = self._nearest([vector], n)
+        if include_distances:
+            return rows[0].tolist(), distances[0].tolist()
+        return rows[0].tolist()
+
+
+def load_search_index(directory, exact_max=EXACT_SEARCH_MAX):
+    """A saved RecipeIndex, swapped for an ExactRecipeIndex when the catalog is small"""
+    index = RecipeIndex.load(directory)
+    if len(index) <= exact_max and index.metric in ("euclidean", "angular"):
+        return ExactRecipeIndex.from_index(index)
+    return index
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class DeltaLog(object):
+    """
+    Append-only log of index changes, one JSON line per change.
+
+    Writers hold an exclusive lock on a side file, so appends from several
+    processes never interleave and a rewrite never loses an append.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _locked(self):
+        lock = open(self.path + ".lock", "a")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def append(self, op, recipe_id, vector=None):
+        entry = {"op": op, "id": int(recipe_id)}
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            entry["vector"] = base64.b64encode(vector.tobytes()).decode("ascii")
+        with self._locked():
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def position(self):
+        """(inode, size) of the log, to drop what has been read so far later"""
+        signature = _signature(self.path)
+        return None if signature is None else (signature[0], signature[2])
+
+    def read(self, offset=0):
+        """
+        The complete entries after offset.
+
+        Returns:
+        - (list of dict, int): The entries, and the offset to continue from.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        end = data.rfind(b"\n") + 1  # ignore a line that is still being written
+        entries = []
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            if "vector" in entry:
+                entry["vector"] = np.frombuffer(base64.b64decode(entry["vector"]), dtype=np.float32)
+            entries.append(entry)
+        return entries, offset + end
+
+    def drop_before(self, position):
+        """Remove the entries up to position (from position()), keeping later appends"""
+        if position is None:
+            return
+        inode, offset = position
+        with self._locked():
+            signature = _signature(self.path)
+            if signature is None or signature[0] != inode:
+                return  # someone else rewrote the log in the meantime
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                rest = f.read()
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(rest)
+            os.replace(tmp_path, self.path)
+
+
+class TieredRecipeIndex(object):
+    """
+    A saved RecipeIndex plus the changes made since it was built.
+
+    Upserts and removals go to the shared DeltaLog. Before every search the
+    index reloads the base if it was rebuilt, and replays new log entries:
+    upserted vectors go to the in-memory delta and hide the base copy of the
+    recipe, removals only hide it (tombstones).
+
+    Parameters:
+    - directory (str): Directory of the RecipeIndex; the log lives in it too.
+    - metric (str): Distance used while there is no base yet.
+    """
+
+    def __init__(self, directory, metric="euclidean"):
+        self.directory = str(directory)
+        self.metric = metric
+        self.log = DeltaLog(os.path.join(self.directory, DELTA_FILE))
+        self.base = None
+        self._base_signature = None
+        self._log_inode = None
+        self._log_offset = 0
+        self._lock = threading.RLock()
+        self._reset_delta()
+
+    def _reset_delta(self):
+        self.delta = {}  # recipe id -> vector
+        self.tombstones = set()
+        self._delta_matrix = None
+
+    def refresh(self):
+        with self._lock:
+            signature = _signature(os.path.join(self.directory, META_FILE))
+            if signature != self._base_signature:
+                self.base = load_search_index(self.directory) if signature else None
+                self._base_signature = signature
+                self.metric = self.base.metric if self.base else self.metric
+                # the new base may already contain the delta, replay the log on top of it
+                self._reset_delta()
+                self._log_offset = 0
+
+            log_signature = _signature(self.log.path)
+            log_inode = log_signature[0] if log_signature else None
+            if log_inode != self._log_inode:
+                # the log was rewritten by a compaction, replay it from the start
+                self._reset_delta()
+                self._log_inode = log_inode
+                self._log_offset = 0
+            if log_inode is None:
+                return
+
+            entries, self._log_offset = self.log.read(self._log_offset)
+            for entry in entries:
+                self._apply(entry)
+
+    def _apply(self, entry):
+        recipe_id = entry["id"]
+        self.tombstones.add(recipe_id)
+        if entry["op"] == "upsert":
+            self.delta[recipe_id] = entry["vector"]
+        else:
+            self.delta.pop(recipe_id, None)
+        self._delta_matrix = None
+
+    def upsert(self, recipe_id, vector):
+        os.makedirs(self.directory, exist_ok=True)
+        self.log.append("upsert", recipe_id, vector)
+        self.refresh()
+
+    def remove(self, recipe_id):
+        os.makedirs(self.directory, exist_ok=True)
+        self.log.append("remove", recipe_id)
+        self.refresh()
+
+    @property
+    def delta_size(self):
+        """changes waiting to be compacted into the base"""
+        return len(self.tombstones)
+
+    def search(self, vector, n=10, search_k=-1):
+        """
+        The n recipes nearest to vector across both tiers.
+
+        Returns:
+        - list of (int, float): (Recipe.id, distance), nearest first.
+        """
+        with self._lock:
+            self.refresh()
+            results = []
+            if self.base:
+                # fetch enough extra neighbours to make up for hidden ones
+                hits = self.base.search(vector, n + len(self.tombstones), search_k)
+                results = [hit for hit in hits if hit[0] not in self.tombstones]
+
+            if self.delta:
+                if self._delta_matrix is None:
+                    self._delta_matrix = (
+                        np.fromiter(self.delta.keys(), dtype=np.int64, count=len(self.delta)),
+                        np.stack(list(self.delta.values())),
+                    )
+                ids, matrix = self._delta_matrix
+                distances = _distances(self.metric, matrix, np.asarray(vector, dtype=np.float32))
+                nearest = np.argsort(distances)[:n]
+                results += [(int(ids[i]), float(distances[i])) for i in nearest]
+
+        results.sort(key=lambda hit: hit[1])
+        return results[:n]
+
+    def compact(self, n_trees=100):
+        """
+        Build a new base from the live base items and the delta.
+
+        Runs outside the search lock, so it can be called from a background
+        thread. Only one process compacts at a time.
+
+        Returns:
+        - bool: False if another process was already compacting.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "compact.lock"), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+
+            with self._lock:
+                self.refresh()
+                base, delta, tombstones = self.base, dict(self.delta), set(self.tombstones)
+                position = (self._log_inode, self._log_offset) if self._log_inode else None
+
+            ids, vectors = [], []
+            if base:
+                for recipe_id, vector in base.items():
+                    if recipe_id not in tombstones:
+                        ids.append(recipe_id)
+                        vectors.append(vector)
+            ids += list(delta)
+            vectors += list(delta.values())
+            if not ids:
+                return True
+
+            RecipeIndex.build(ids, np.array(vectors), base.metric if base else self.metric, n_trees).save(
+                self.directory
+            )
+            self.log.drop_before(position)
+        return True
@@ -0,0 +1,235 @@
+"""
+Concurrent, polite recipe crawling.
+
+A ScrapeEngine fetches collection pages and recipe pages on a thread pool
+through one shared requests.Session, so connections to a site are kept
+alive and reused. Every host has its own limits: at most per_host requests
+in flight and at least min_interval seconds between request starts.
+Connection errors, 429s and 5xx responses are retried with exponential
+backoff and jitter, honouring Retry-After.
+
+crawl() yields (source, url, recipe) as soon as each recipe is parsed, so
+the caller can append them to the catalog while the crawl goes on.
+
+host_aliases sends the requests for a host to another base URL while
+recipe_scrapers still sees the original URL. It is used to crawl the saved
+pages served by scripts/scrape_fixtures.py instead of the real sites.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from bs4 import BeautifulSoup
+from recipe_scrapers import scrape_html
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; cheffrey-recipe-crawler)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# host -> (source name, link pattern of its recipe cards on collection pages)
+COLLECTION_SOURCES = {
+    "cooking.nytimes.com": ("New York Times", {"class": "image-anchor card-link"}),
+    "www.bonappetit.com": ("Bon Appetit", {"href": re.compile(r"/recipe")}),
+}
+
+
+class HostLimiter(object):
+    """
+    Concurrency and rate limit for one host.
+
+    Parameters:
+    - max_concurrent (int): Requests in flight at once.
+    - min_interval (float): Seconds between the starts of two requests.
+    """
+
+    def __init__(self, max_concurrent, min_interval):
+        self.min_interval = min_interval
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+    def back_off(self, seconds):
+        """delay every later request to the host, after a 429 or Retry-After"""
+        with self._lock:
+            self._next_start = max(self._next_start, time.monotonic() + seconds)
+
+
+class ScrapeEngine(object):
+    """
+    Parameters:
+    - max_workers (int): Threads fetching at once, across all hosts.
+    - per_host (int): Requests in flight per host.
+    - min_interval (float): Seconds between request starts per host.
+    - retries (int): Retries after the first attempt.
+    - backoff (float): First retry delay in seconds, doubled on every retry.
+    - timeout (float): Seconds per request.
+    - host_aliases (dict): host -> base URL to fetch its pages from instead.
+    - session (requests.Session): Shared session, a new one by default.
+    """
+
+    def __init__(
+        self,
+        max_workers=8,
+        per_host=2,
+        min_interval=1.0,
+        retries=3,
+        backoff=1.0,
+        timeout=20.0,
+        host_aliases=None,
+        session=None,
+    ):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.host_aliases = host_aliases or {}
+        self.session = session or self._new_session()
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.max_workers, pool_maxsize=self.max_workers
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = USER_AGENT
+        return session
+
+    def _limiter(self, host) -> HostLimiter:
+        with self._limiters_lock:
+            if host not in self._limiters:
+                self._limiters[host] = HostLimiter(self.per_host, self.min_interval)
+            return self._limiters[host]
+
+    def resolve(self, url) -> str:
+        """the URL actually fetched for url, after host_aliases"""
+        parts = urlsplit(url)
+        base = self.host_aliases.get(parts.netloc)
+        if base is None:
+            return url
+        return base.rstrip("/") + parts.path + ("?" + parts.query if parts.query else "")
+
+    def fetch(self, url) -> str:
+        """
+        The body of url, retried with backoff on transient failures.
+
+        Raises:
+        - requests.RequestException: The last error once the retries are used up.
+        """
+        host = urlsplit(url).netloc
+        limiter = self._limiter(host)
+        target = self.resolve(url)
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+            try:
+                with limiter:
+                    response = self.session.get(target, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.text
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                if response.status_code == 429:
+                    limiter.back_off(delay)
+                error = requests.HTTPError(f"{response.status_code} for {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.retries:
+                raise error
+            logger.info(f"Retrying {url} in {delay:.1f}s after: {error}")
+            time.sleep(delay)
+
+    def scrape_recipe(self, url) -> dict:
+        """the recipe at url, parsed by recipe_scrapers as if fetched from url itself"""
+        return scrape_html(self.fetch(url), org_url=url).to_json()
+
+    def collection_urls(self, collection_url) -> tuple[str, list[str]]:
+        """
+        The recipes linked from a collection page.
+
+        Returns:
+        - (str, list of str): The source name and the recipe URLs, in page order.
+        """
+        host = urlsplit(collection_url).netloc
+        if host not in COLLECTION_SOURCES:
+            raise ValueError(f"Unrecognized source: {host}")
+        source, card_attributes = COLLECTION_SOURCES[host]
+
+        soup = BeautifulSoup(self.fetch(collection_url), features="lxml")
+        urls = []
+        for card in soup.find_all("a", card_attributes):
+            url = urljoin(collection_url, card.get("href"))
+            if url not in urls:
+                urls.append(url)
+        return source, urls
+
+    def crawl(self, collection_urls=(), recipe_urls=None, skip_url=None):
+        """
+        Scrape collections and single recipes concurrently.
+
+        Parameters:
+        - collection_urls (list of str): Collection pages, their recipes are scraped too.
+        - recipe_urls (dict): source -> list of recipe URLs to scrape directly.
+        - skip_url (callable): skip_url(url) is True for recipes not to download.
+
+        Yields:
+        - (str, str, dict): The source, the URL and the recipe, in completion
+          order. Failed pages are logged and skipped.
+        """
+        skip_url = skip_url or (lambda url: False)
+        queued = set()
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            running = {}
+
+            def submit_recipe(source, url):
+                if url in queued or skip_url(url):
+                    return
+                queued.add(url)
+                running[pool.submit(self.scrape_recipe, url)] = ("recipe", source, url)
+
+            for url in collection_urls:
+                running[pool.submit(self.collection_urls, url)] = ("collection", None, url)
+            for source, urls in (recipe_urls or {}).items():
+                for url in urls:
+                    submit_recipe(source, url)
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, source, url = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.warning(f"Failed {kind} {url}: {e}")
+                        continue
+                    if kind == "collection":
+                        source, urls = result
+                        for recipe_url in urls:
+                            submit_recipe(source, recipe_url)
+                    else:
+                        yield source, url, result
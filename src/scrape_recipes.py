@@ -1,67 +1,92 @@
 import cheffrey
-from recipe_scrapers import scrape_me as scrape_recipe
-from bs4 import BeautifulSoup
-import requests
-import os
-import re
-import json
+import argparse
+import time
+from recipe_catalog import append_recipe
+from scrape_engine import ScrapeEngine
+from dedup_store import DedupStore
 
-
-def pull_existing_recipes():
-    master_recipes = cheffrey.load_local_recipes()
-    titles = list(master_recipes.keys())
-    urls = [r["canonical_url"] for r in master_recipes.values()]
-    return titles, urls
+engine = ScrapeEngine()
 
 
 def add_to_recipe(recipe):
-    # TODO: inefficient to load and save everytime
-    master_recipes = cheffrey.load_local_recipes()
-    master_recipes[recipe["title"]] = recipe
-    with open(cheffrey.ROOT_DIR / "data/recipes.json", "w") as f:
-        json.dump(master_recipes, f)
+    append_recipe(recipe)
+
+
+def store_recipe(recipe, source, url, dedup):
+    """
+    Append a scraped recipe to the catalog unless it is already there.
+
+    The recipe is appended before it is recorded in the dedup store, so a
+    crash can't leave the store claiming a recipe the catalog lacks. A crash
+    between the two leaves it in the catalog only, and the next crawl
+    appends it again under a "(source)" title; rebuilding the store from the
+    catalog (dedup_store.py --rebuild) before crawling again avoids that.
+
+    Returns:
+    - bool: Whether the recipe was added.
+    """
+    if dedup.has_url(recipe.get("canonical_url")):
+        # fetched under another URL, or redirected to one we have: only the
+        # URL is new, the title stored with the recipe is the one it was added under
+        dedup.add(None, url)
+        return False
+    recipe["title"] = dedup.unique_title(recipe["title"], source)
+    add_to_recipe(recipe)
+    dedup.add(recipe["title"], url, recipe.get("canonical_url"))
+    return True
 
 
-def download_recipe(url_to_download, existing_titles, existing_urls, source):
-    if url_to_download in existing_urls:
+def download_recipe(url_to_download, dedup, source):
+    if dedup.has_url(url_to_download):
         print(f"Skipping. Already in database")
         return
-    recipe = scrape_recipe(url_to_download)
-    recipe = recipe.to_json()
-    if recipe["title"] in existing_titles:
-        recipe["title"] += f" ({source})"
-    # we already checked if one exists
-    add_to_recipe(recipe)
+    store_recipe(engine.scrape_recipe(url_to_download), source, url_to_download, dedup)
+
+
+def crawl_recipes(collection_urls=(), recipe_urls=None, engine=engine):
+    """
+    Scrape collections and recipe URLs concurrently, appending each recipe to
+    the catalog as soon as it is parsed.
+
+    Parameters:
+    - collection_urls (list of str): Collection pages.
+    - recipe_urls (dict): source -> list of recipe URLs.
+    - engine (ScrapeEngine): The engine to crawl with.
+    """
+    dedup = DedupStore.open()
+    n_recipes = 0
+    try:
+        for source, url, recipe in engine.crawl(
+            collection_urls, recipe_urls, skip_url=dedup.has_url
+        ):
+            if store_recipe(recipe, source, url, dedup):
+                n_recipes += 1
+                print("Succeeded: ", recipe["title"])
+    finally:
+        dedup.close()
+    return n_recipes
 
 
 def scrape_collection(collection_url):
-    base_url = collection_url.split(".com")[0] + ".com/"
-    res = requests.get(collection_url)
-    res.raise_for_status()
-    soup = BeautifulSoup(res.text, features="lxml")
-
-    if base_url == "https://cooking.nytimes.com/":
-        recipe_cards = soup.find_all("a", {"class": "image-anchor card-link"})
-        source = "New York Times"
-    elif base_url == "https://www.bonappetit.com/":
-        recipe_cards = soup.find_all("a", {"href": re.compile(r"/recipe")})
-        source = "Bon Appetit"
-    else:
-        raise ValueError(f"Unrecognized source: {base_url}")
-
-    existing_titles, existing_urls = pull_existing_recipes()
-    for card in recipe_cards:
-        extension = card.get("href")
-        url = base_url + extension
-
-        try:
-            download_recipe(url, existing_titles, existing_urls, source)
-            print("Succeeded: ", extension)
-        except Exception as e:
-            print("Failed: ", extension, e)
+    return crawl_recipes([collection_url])
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape the recipe collections into the catalog")
+    parser.add_argument("--workers", type=int, default=8, help="fetches in flight")
+    parser.add_argument("--per-host", type=int, default=2, help="fetches in flight per site")
+    parser.add_argument(
+        "--interval", type=float, default=1.0, help="seconds between fetches per site"
+    )
+    parser.add_argument(
+        "--alias",
+        action="append",
+        default=[],
+        metavar="HOST=URL",
+        help="fetch HOST from URL instead, e.g. a scripts/scrape_fixtures.py server",
+    )
+    args = parser.parse_args()
+
     collection_url_list = [
         "https://cooking.nytimes.com/68861692-nyt-cooking/11249289-weekly-plan",
         "https://cooking.nytimes.com/68861692-nyt-cooking/1640510-sam-siftons-suggestions",
@@ -103,12 +128,15 @@ def main():
         ]
     }
 
-    for url in collection_url_list:
-        scrape_collection(url)
-    existing_titles, existing_urls = pull_existing_recipes()
-    for source, url_list in non_collections.items():
-        for url in url_list:
-            download_recipe(url, existing_titles, existing_urls, source)
+    crawl_engine = ScrapeEngine(
+        max_workers=args.workers,
+        per_host=args.per_host,
+        min_interval=args.interval,
+        host_aliases=dict(alias.split("=", 1) for alias in args.alias),
+    )
+    start = time.perf_counter()
+    n_recipes = crawl_recipes(collection_url_list, non_collections, engine=crawl_engine)
+    print(f"Scraped {n_recipes} recipes in {time.perf_counter() - start:.1f}s")
 
 
 if __name__ == "__main__":
@@ -32,18 +32,119 @@ from __future__ import division
 from builtins import int, str
 
 
+def _immutable(self, name, value):
+    raise AttributeError("%s objects are immutable" % type(self).__name__)
+
+
+def _rebuild(cls, state):
+    """unpickle/copy an immutable slotted object without going through __setattr__"""
+    obj = object.__new__(cls)
+    for name, value in state.items():
+        object.__setattr__(obj, name, value)
+    return obj
+
+
+def _reduce(self):
+    """__reduce__ for the immutable slotted types, so copy, deepcopy and pickle work"""
+    slots = [
+        name
+        for cls in type(self).__mro__
+        for name in cls.__dict__.get("__slots__", ())
+    ]
+    return _rebuild, (type(self), {name: getattr(self, name) for name in slots})
+
+
+def normalize_name(name):
+    """key under which elements are compared and interned
+
+    >>> normalize_name('  Brown   Sugar ')
+    'brown sugar'
+    """
+    return " ".join(name.lower().split())
+
+
+def _new_element(cls, name, density, is_int, properties):
+    return cls(name, density, is_int, **properties)
+
+
 class Element(object):
-    """Food or other element with certain properties"""
+    """Food or other element with certain properties
 
-    def __init__(self, name, **properties):
-        """properties are set as attributes for easier access
+    Elements are immutable and compare equal (and hash) by normalized name, so
+    Element('Flour') and Element('flour') are the same key in a dict.
+    Element.get returns one shared instance per name.
+    """
+
+    __slots__ = ("name", "key", "density", "is_int", "properties", "_hash")
+    registry = {}
+
+    def __init__(self, name, density=None, is_int=False, **properties):
+        """other properties are available as attributes for easier access
 
         >>> Element('flour', color='#ffffff', density=0.7).density
         0.7
+        >>> Element('flour', color='#ffffff').color
+        '#ffffff'
+        >>> Element('Flour') == Element('flour')
+        True
         """
-        self.name = name
-        for prop in properties:
-            setattr(self, prop, properties[prop])
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "key", normalize_name(name))
+        object.__setattr__(self, "_hash", hash(self.key))
+        object.__setattr__(self, "density", density)
+        object.__setattr__(self, "is_int", is_int)
+        object.__setattr__(self, "properties", properties)
+
+    @classmethod
+    def get(cls, name, **properties):
+        """interned element for name, created with properties on first use
+
+        >>> Element.get('Paprika') is Element.get('paprika')
+        True
+        >>> Element.get('paprika', density=0.5)
+        Traceback (most recent call last):
+        ...
+        ValueError: Element Paprika already exists with density=None, not 0.5
+        """
+        key = normalize_name(name)
+        element = cls.registry.get(key)
+        if element is None:
+            return cls.registry.setdefault(key, cls(name, **properties))
+        for prop, value in properties.items():
+            current = getattr(element, prop, None)
+            if current != value:
+                raise ValueError(
+                    "Element %s already exists with %s=%r, not %r"
+                    % (element.name, prop, current, value)
+                )
+        return element
+
+    __setattr__ = _immutable
+
+    def __reduce__(self):
+        # interned elements come back as the interned instance
+        if Element.registry.get(self.key) is self:
+            return Element.get, (self.name,)
+        # rebuilt through __init__, the hash of the key differs between processes
+        return _new_element, (type(self), self.name, self.density, self.is_int, self.properties)
+
+    def __getattr__(self, name):
+        # only called for names that are not slots
+        try:
+            return object.__getattribute__(self, "properties")[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        return isinstance(other, Element) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self._hash
 
     def __repr__(self):
         return self.name
@@ -60,9 +161,14 @@ class Ingredient(object):
     30 ml cyanide
     """
 
+    __slots__ = ("amount", "element")
+
     def __init__(self, amount, element):
-        self.amount = amount
-        self.element = element
+        object.__setattr__(self, "amount", amount)
+        object.__setattr__(self, "element", element)
+
+    __setattr__ = _immutable
+    __reduce__ = _reduce
 
     def to(self, unit):
         """Convert to a different unit, or measure depending on the properties of its element
@@ -97,9 +203,14 @@ class Amount(object):
     3 hl
     """
 
+    __slots__ = ("value", "unit")
+
     def __init__(self, value, unit):
-        self.value = value
-        self.unit = unit
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "unit", unit)
+
+    __setattr__ = _immutable
+    __reduce__ = _reduce
 
     def to(self, unit, properties=None):
         """convert to another unit of the same measure
@@ -206,10 +317,12 @@ class Measure(object):
             raise ValueError(
                 "%s already contains a unit named %s" % (self.name, unit.name)
             )
-        unit.measure = self
+        unit._bind(self)
         self.units[unit.name] = unit
+        Unit.registry.setdefault(unit.name, unit)
         for name in unit.alternate_names:
             self.units[name] = unit
+            Unit.registry.setdefault(name, unit)
         setattr(self, unit.name, unit)
 
     def addUnits(self, units):
@@ -244,10 +357,15 @@ class Converter(object):
     25.0
     """
 
-    def __init__(self, toBaseConversion, fromBaseConversion):
-        """create a converter using 2 functions : convert to base, convert from base"""
+    def __init__(self, toBaseConversion, fromBaseConversion, linear=None):
+        """create a converter using 2 functions : convert to base, convert from base
+
+        linear: optional (factor, constant) such that toBase(n) == n * factor + constant,
+        used by ConversionTable to compile conversions without calling the functions
+        """
         self.toBase = toBaseConversion
         self.fromBase = fromBaseConversion
+        self.linear = linear
 
     @property
     def reverse(self):
@@ -255,8 +373,14 @@ class Converter(object):
 
         >>> Converter(lambda n: n / 2, lambda n: 2 * n).reverse.toBase(21)
         42
+        >>> Converter.Linear(1.8, 32).reverse.linear
+        (0.5555555555555556, -17.77777777777778)
         """
-        return Converter(self.fromBase, self.toBase)
+        linear = None
+        if self.linear is not None:
+            factor, constant = self.linear
+            linear = (1 / factor, -constant / factor)
+        return Converter(self.fromBase, self.toBase, linear)
 
     @classmethod
     def Linear(cls, factor, constant=0):
@@ -265,7 +389,11 @@ class Converter(object):
         >>> Converter.Linear(5, 1).toBase(2)
         11
         """
-        return cls(lambda n: n * factor + constant, lambda n: (n - constant) / factor)
+        return cls(
+            lambda n: n * factor + constant,
+            lambda n: (n - constant) / factor,
+            linear=(factor, constant),
+        )
 
     @classmethod
     def Constant(cls, constant):
@@ -283,7 +411,17 @@ Converter.Neutral = Converter.Linear(1)
 
 
 class Unit(object):
-    """Unit of a measure, i.e. gram (mass), liter (volume) etc."""
+    """Unit of a measure, i.e. gram (mass), liter (volume) etc.
+
+    Units are immutable once a Measure has adopted them, and every unit added
+    to a measure is interned in Unit.registry under its name and alternate names.
+
+    >>> Unit.get('cups') is Volume.cup
+    True
+    """
+
+    __slots__ = ("name", "abrev", "preFix", "converter", "measure", "alternate_names")
+    registry = {}
 
     def __init__(
         self,
@@ -305,12 +443,34 @@ class Unit(object):
         >>> (3 * Length.decameter).to(Length.yard)
         32.8084 yd
         """
-        self.name = name
-        self.abrev = abrev
-        self.preFix = preFix
-        self.converter = converter
-        self.measure = None  # set by Measures when they add a unit
-        self.alternate_names = alternate_names
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "abrev", abrev)
+        object.__setattr__(self, "preFix", preFix)
+        object.__setattr__(self, "converter", converter)
+        object.__setattr__(self, "measure", None)  # set by Measures when they add a unit
+        object.__setattr__(self, "alternate_names", tuple(alternate_names))
+
+    __setattr__ = _immutable
+
+    def __reduce__(self):
+        # registered units come back as the registered instance, their
+        # converters are lambdas that can't be pickled anyway
+        if Unit.registry.get(self.name) is self:
+            return Unit.get, (self.name,)
+        return _reduce(self)
+
+    def _bind(self, measure):
+        if self.measure is not None:
+            raise ValueError("%s already belongs to %s" % (self.name, self.measure.name))
+        object.__setattr__(self, "measure", measure)
+
+    @classmethod
+    def get(cls, name):
+        """the registered unit called name (or one of its alternate names)"""
+        try:
+            return cls.registry[name]
+        except KeyError:
+            raise ValueError("Unrecognized unit: " + name)
 
     def __mul__(self, other):
         return self.__rmul__(other)
@@ -479,12 +639,159 @@ Mass.addUnits(
 )
 
 
+class ConversionTable(object):
+    """Precompiled unit conversions
+
+    Every conversion between units of the registered measures is an affine
+    function y = factor * x + offset. The table computes the (factor, offset)
+    pair of each (unit, unit) pair once, so converting a value is a multiply and
+    an add instead of a walk through Converter closures and new Amount objects.
+    Conversions across measures (volume <-> mass) go through element density.
+
+    >>> conversions.convert(2, Volume.cup, Volume.milliliter)
+    473.176
+    >>> round(conversions.convert(37.7, Temperature.celsius, Temperature.fahrenheit), 2)
+    99.86
+    >>> round(conversions.convert(1, Volume.cup, Mass.gram, Flour), 4)
+    165.6116
+    """
+
+    def __init__(self, measures, density_factors=None):
+        """measures: the Measures to compile
+        density_factors: {(fromMeasure, toMeasure): (k, exponent)} so that converting
+        one base unit of fromMeasure gives k * density ** exponent base units of toMeasure
+        """
+        self.measures = list(measures)
+        self.density_factors = dict(density_factors or {})
+        self._pairs = {}
+        self._units = []
+        self._unit_codes = {}
+        self.compile()
+
+    def compile(self):
+        """(re)compute every pair within each measure, i.e. after adding units"""
+        for measure in self.measures:
+            units = _unique(measure.units.values())
+            for unit in units:
+                self.code(unit)
+                for other in units:
+                    self._pairs[(unit, other)] = self._compose(unit, other)
+
+    def code(self, unit):
+        """small integer identifying a unit, for the vectorized conversions"""
+        if unit not in self._unit_codes:
+            self._unit_codes[unit] = len(self._units)
+            self._units.append(unit)
+        return self._unit_codes[unit]
+
+    @staticmethod
+    def _toBase(unit):
+        if unit.converter.linear is None:
+            raise ValueError("%s has a non linear converter" % unit.name)
+        return unit.converter.linear
+
+    def _compose(self, fromUnit, toUnit):
+        fromFactor, fromOffset = self._toBase(fromUnit)
+        toFactor, toOffset = self._toBase(toUnit)
+        # base = fromFactor * x + fromOffset; y = (base - toOffset) / toFactor
+        return fromFactor / toFactor, (fromOffset - toOffset) / toFactor
+
+    def linear(self, fromUnit, toUnit, element=None):
+        """(factor, offset) converting fromUnit into toUnit
+
+        >>> conversions.linear(Mass.kilogram, Mass.gram)
+        (1000.0, 0.0)
+        """
+        if isinstance(toUnit, Measure):
+            toUnit = toUnit.baseUnit
+        pair = self._pairs.get((fromUnit, toUnit))
+        if pair is not None:
+            return pair
+
+        if fromUnit.measure is toUnit.measure:
+            pair = self._pairs[(fromUnit, toUnit)] = self._compose(fromUnit, toUnit)
+            return pair
+
+        key = (fromUnit.measure, toUnit.measure)
+        if key not in self.density_factors:
+            raise ValueError(
+                "No transformation known bewteen "
+                + fromUnit.measure.name
+                + " and "
+                + toUnit.measure.name
+            )
+        if element is None or getattr(element, "density", None) is None:
+            raise ValueError("Converting between measures needs an element with a density")
+        k, exponent = self.density_factors[key]
+        toBaseFactor, toBaseOffset = self.linear(fromUnit, fromUnit.measure.baseUnit)
+        fromBaseFactor, fromBaseOffset = self.linear(toUnit.measure.baseUnit, toUnit)
+        scale = k * element.density**exponent
+        return (
+            toBaseFactor * scale * fromBaseFactor,
+            toBaseOffset * scale * fromBaseFactor + fromBaseOffset,
+        )
+
+    def convert(self, value, fromUnit, toUnit, element=None):
+        """convert a single value"""
+        factor, offset = self.linear(fromUnit, toUnit, element)
+        return value * factor + offset
+
+    def convert_many(self, values, fromUnit, toUnit, element=None):
+        """convert a sequence of values sharing one unit, returns a numpy array"""
+        factor, offset = self.linear(fromUnit, toUnit, element)
+        return _numpy().asarray(values, dtype=float) * factor + offset
+
+    def convert_codes(self, values, unitCodes, toUnit):
+        """convert values with mixed units (given by code()) of one measure to toUnit
+
+        >>> codes = [conversions.code(Volume.cup), conversions.code(Volume.tablespoon)]
+        >>> conversions.convert_codes([1, 2], codes, Volume.tablespoon).tolist()
+        [16.0, 2.0]
+        """
+        np = _numpy()
+        factors = np.empty(len(self._units))
+        offsets = np.empty(len(self._units))
+        for code, unit in enumerate(self._units):
+            try:
+                factors[code], offsets[code] = self.linear(unit, toUnit)
+            except ValueError:
+                factors[code] = offsets[code] = np.nan
+        unitCodes = np.asarray(unitCodes, dtype=np.intp)
+        return np.asarray(values, dtype=float) * factors[unitCodes] + offsets[unitCodes]
+
+
+def _unique(units):
+    """units of a measure without the duplicates registered under alternate names"""
+    seen = []
+    for unit in units:
+        if not any(unit is other for other in seen):
+            seen.append(unit)
+    return seen
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("numpy is required for vectorized conversions")
+    return numpy
+
+
+conversions = ConversionTable(
+    [Mass, Volume, Temperature, Length, Time, Count],
+    density_factors={
+        # grams per liter = density (g/ml) * 1000
+        (Volume, Mass): (1000.0, 1),
+        (Mass, Volume): (0.001, -1),
+    },
+)
+
 # Common Ingredients
 
-Flour = Element("Flour", density=0.7)
-Sugar = Element("Sugar", density=1.2)
-Salt = Element("Salt", density=1.2)
-Butter = Element("Butter", density=0.9)
+Flour = Element.get("Flour", density=0.7)
+Sugar = Element.get("Sugar", density=1.2)
+Salt = Element.get("Salt", density=1.2)
+Butter = Element.get("Butter", density=0.9)
 
 available_measures = dict(Volume.units, **Mass.units, **Count.units)
 available_measures.update(Mass.units)
@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+
+# the app reads its config on import, so this has to come first
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["ENV"] = "test"
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+
+from app import app as flask_app, db  # noqa: E402
+from app.catalog import CatalogVersion  # noqa: E402
+from app.models import Recipe  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def catalog_version(tmp_path):
+    """a catalog version of its own, instead of the one in data/"""
+    return CatalogVersion(str(tmp_path / "catalog_version"))
+
+
+def make_recipe(recipe_id, **fields):
+    """a Recipe with every column to_dict needs filled in"""
+    defaults = dict(
+        title=f"Recipe {recipe_id}",
+        author="1",
+        ingredients="1 cup flour,2 eggs",
+        instructions="Mix.\nBake.",
+        is_public=True,
+    )
+    fields = {**defaults, **fields}
+    return Recipe(id=recipe_id, **fields)
@@ -0,0 +1,28 @@
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import dataloader  # noqa: E402
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Body, Bucket, Key):
+        self.objects[Key] = json.loads(Body)
+
+
+def test_save_recipe_keyed_by_capitalized_title():
+    loader = dataloader.S3Loader.__new__(dataloader.S3Loader)
+    loader.bucket, loader.s3 = "cheffrey", FakeS3()
+    # the Streamlit app's recipes only have "Title"
+    recipe = {"Title": "Walnut Picadillo", "Ingredients": ["1 cup walnuts"]}
+
+    key = loader.save_recipe(recipe, recipe["Title"], "recipes/added/")
+
+    assert key == "recipes/added/" + hashlib.sha1(b"Walnut Picadillo").hexdigest() + ".json"
+    assert loader.s3.objects == {key: recipe}
@@ -0,0 +1,32 @@
+from app import db
+from app.models import Recipe
+from conftest import make_recipe
+from app import explore_feed as explore_feed_module
+from app.explore_feed import ExploreFeed
+
+
+def add_recipes(ids, is_public=True, author="1"):
+    for recipe_id in ids:
+        db.session.add(make_recipe(recipe_id, author=author, is_public=is_public))
+    db.session.commit()
+
+
+def test_pages_are_stable_across_a_version_bump(app, catalog_version, monkeypatch):
+    monkeypatch.setattr(explore_feed_module, "catalog_version", catalog_version)
+    feed = ExploreFeed()
+    add_recipes(range(1, 101))
+    add_recipes([1001, 1002], is_public=False)
+    n_public = len(feed.public_ids())
+    extra_ids = [1001, 1002]
+
+    seen = feed.page_ids(7, 1, 10, extra_ids, n_public)
+    # someone publishes recipes and one of the user's own goes public mid-session
+    add_recipes(range(101, 121))
+    db.session.get(Recipe, 1001).is_public = True
+    db.session.commit()
+    catalog_version.bump()
+
+    for page in range(2, 12):
+        seen += feed.page_ids(7, page, 10, extra_ids, n_public)
+    assert len(seen) == len(set(seen))
+    assert set(seen) | {1001} == set(range(1, 101)) | {1001, 1002}
@@ -0,0 +1,63 @@
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.models import User
+from app import explore_feed as explore_feed_module
+from conftest import make_recipe
+
+
+class StringId:
+    """user with a string id, newer PyJWT only accepts string subjects"""
+
+    def __init__(self, user):
+        self.user = user
+        self.id = str(user.id)
+
+    def __getattr__(self, name):
+        return getattr(self.user, name)
+
+
+def login(client, user):
+    token = create_access_token(identity=StringId(user))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_explore_session_keeps_counts_not_ids(app, catalog_version, monkeypatch):
+    monkeypatch.setattr(explore_feed_module, "catalog_version", catalog_version)
+    user = User(email="cook@example.com")
+    db.session.add(user)
+    db.session.commit()
+    db.session.add_all(
+        make_recipe(i, author=str(user.id), is_public=i <= 20) for i in range(1, 221)
+    )
+    db.session.commit()
+
+    client = app.test_client()
+    headers = login(client, user)
+    ids = []
+    for page in range(1, 40):
+        response = client.get(f"/api/load-more-recipes/?page={page}", headers=headers)
+        assert response.status_code == 200
+        ids += [recipe["id"] for recipe in response.json["recipes"]]
+
+    assert sorted(ids) == list(range(1, 221))
+    with client.session_transaction() as session:
+        assert session["explore_n_public"] == 20
+        assert session["explore_n_private"] == 200
+        assert "explore_extra_ids" not in session
+
+
+def test_search_without_a_user(app):
+    db.session.add_all(
+        [
+            make_recipe(1, title="Chicken Noodle Soup"),
+            make_recipe(2, title="Chicken Curry", is_public=False),
+        ]
+    )
+    db.session.commit()
+
+    client = app.test_client()
+    for endpoint in ("/api/search-recipes/", "/api/semantic-search/"):
+        response = client.post(endpoint, json={"query": "chicken"})
+        assert response.status_code == 200
+        assert [recipe["id"] for recipe in response.json["recipes"]] == [1]
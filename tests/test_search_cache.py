@@ -0,0 +1,14 @@
+from app.search_cache import SearchCache
+
+
+def test_least_recently_used_results_are_evicted(app):
+    search_cache = SearchCache(max_entries=2)
+    runs = []
+
+    def search(query):
+        return lambda: runs.append(query) or [1, 2, 3]
+
+    for query in ("soup", "pasta", "soup", "curry", "soup", "pasta"):
+        assert search_cache.get_or_search("fulltext", query, None, search(query)) == ([1, 2, 3], True)
+    # "pasta" was the least recently used when "curry" came in
+    assert runs == ["soup", "pasta", "curry", "pasta"]
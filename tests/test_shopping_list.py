@@ -0,0 +1,14 @@
+from app.categorizer import OTHER
+from app.shopping_list import group_ingredients
+
+
+def test_lines_differing_in_case_or_spacing_are_merged():
+    grouped = group_ingredients(
+        ["salt to taste", "2 cups flour", "Salt  to taste", "olive oil", " SALT\tTO TASTE"],
+        ["Spices", "Baking", "Spices", OTHER, "Spices"],
+    )
+    assert grouped == {
+        "Baking": ["2 cups flour"],
+        "Spices": ["salt to taste (x3)"],
+        OTHER: ["olive oil"],
+    }